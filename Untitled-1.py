@@ -1,6 +1,21 @@
+import array
+import asyncio
+import bisect
+import concurrent.futures
+import contextlib
+import heapq
+import itertools
 import json
 import bcrypt
+import math
+import multiprocessing
 import os  
+import secrets
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 
 
 class User:
@@ -20,6 +35,12 @@ class User:
     def check_password(self, password):
         return bcrypt.checkpw(password.encode("utf-8"), self._password_hash)
 
+    def get_password_hash(self):
+        return self._password_hash
+
+    def set_password_hash(self, password_hash):
+        self._password_hash = password_hash
+
     def get_role(self):
         return self._role
 
@@ -46,11 +67,29 @@ class User:
         }
 
     @classmethod
-    def from_dict(cls, data):
-        user = cls(data["username"], "dummy_password", data["role"])  # Фиктивный пароль
-        user._password_hash = data["password_hash"].encode("utf-8")
+    def from_hash(cls, username, password_hash, role="user"):
+        """Восстанавливает пользователя по готовому хешу, не вызывая bcrypt."""
+        user = cls.__new__(cls)
+        user._username = username
+        user._password_hash = password_hash
+        user._role = role
         return user
 
+    @classmethod
+    def from_dict(cls, data):
+        role = data.get("role", "user")
+        for field, value in (
+            ("username", data["username"]),
+            ("password_hash", data["password_hash"]),
+            ("role", role),
+        ):
+            if not isinstance(value, str):
+                raise TypeError(f"Поле {field} должно быть строкой, а не {type(value).__name__}")
+        user_cls = Admin if role == "admin" else cls
+        return user_cls.from_hash(
+            data["username"], data["password_hash"].encode("utf-8"), role
+        )
+
 
 class Admin(User):
     def __init__(self, username, password):
@@ -60,17 +99,131 @@ class Admin(User):
         print(f"Admin Username: {self._username}")
 
 
+def _hash_passwords(passwords, rounds):
+    return [
+        bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
+        for password in passwords
+    ]
+
+
+def _check_passwords(pairs):
+    return [
+        bcrypt.checkpw(password.encode("utf-8"), password_hash)
+        for password, password_hash in pairs
+    ]
+
+
+class PasswordHasher:
+    """Пул процессов для bcrypt, разгружающий вызывающий поток.
+
+    Задачи принимаются пачками по batch_size паролей, число одновременно
+    находящихся в работе пачек ограничено max_pending: при заполнении очереди
+    отправка блокируется, пока воркеры не освободятся. rounds — стоимость bcrypt.
+    """
+
+    def __init__(self, workers=None, rounds=12, max_pending=None, batch_size=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.rounds = rounds
+        self.batch_size = batch_size
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 2)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        self._slots.acquire()
+        try:
+            with self._executor_lock:
+                # Процессы запускаются только при первом обращении к bcrypt. fork из
+                # процесса с фоновыми потоками может зависнуть, поэтому spawn
+                if self._executor is None:
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_password(self, password):
+        """Возвращает future с хешем пароля."""
+        future = self._submit(_hash_passwords, [password], self.rounds)
+        return _first_result(future)
+
+    def check_password(self, password, password_hash):
+        """Возвращает future с результатом проверки пароля."""
+        future = self._submit(_check_passwords, [(password, password_hash)])
+        return _first_result(future)
+
+    def hash_many(self, passwords):
+        """Хеширует список паролей параллельно, сохраняя порядок."""
+        return self._run_batches(_hash_passwords, list(passwords), self.rounds)
+
+    def check_many(self, pairs):
+        """Проверяет пары (пароль, хеш) параллельно, сохраняя порядок."""
+        return self._run_batches(_check_passwords, list(pairs))
+
+    def _run_batches(self, fn, items, *args):
+        futures = [
+            self._submit(fn, items[i:i + self.batch_size], *args)
+            for i in range(0, len(items), self.batch_size)
+        ]
+        return [result for future in futures for result in future.result()]
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def _first_result(batch_future):
+    future = concurrent.futures.Future()
+
+    def unwrap(done):
+        if done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result()[0])
+
+    batch_future.add_done_callback(unwrap)
+    return future
+
+
 class Pet:
+    # Без __dict__ у каждого экземпляра: на миллионах питомцев это основная экономия памяти
+    __slots__ = (
+        "_pet_id",
+        "_animal_type",
+        "_gender",
+        "_age",
+        "_color",
+        "_nickname",
+        "_owner_phone",
+    )
+
     def __init__(
         self, pet_id, animal_type, gender, age, color, nickname, owner_phone
     ):
-        self._pet_id = pet_id
-        self._animal_type = animal_type
-        self._gender = gender
-        self._age = age
-        self._color = color
-        self._nickname = nickname
-        self._owner_phone = owner_phone
+        self._pet_id = self._check("pet_id", pet_id)
+        # Тип, пол и цвет повторяются у тысяч питомцев — храним одну копию строки
+        self._animal_type = sys.intern(self._check("animal_type", animal_type))
+        self._gender = sys.intern(self._check("gender", gender))
+        self._age = self._check("age", age)
+        self._color = sys.intern(self._check("color", color))
+        self._nickname = self._check("nickname", nickname)
+        self._owner_phone = self._check("owner_phone", owner_phone)
+
+    @staticmethod
+    def _check(field, value):
+        """Проверяет тип значения поля: pet_id и age — целые, остальные — строки."""
+        if field in ("pet_id", "age"):
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise TypeError(f"Поле {field} должно быть целым числом, а не {type(value).__name__}")
+        elif not isinstance(value, str):
+            raise TypeError(f"Поле {field} должно быть строкой, а не {type(value).__name__}")
+        return value
 
     def get_id(self):
         return self._pet_id
@@ -94,22 +247,22 @@ class Pet:
         return self._owner_phone
 
     def set_animal_type(self, animal_type):
-        self._animal_type = animal_type
+        self._animal_type = sys.intern(self._check("animal_type", animal_type))
 
     def set_gender(self, gender):
-        self._gender = gender
+        self._gender = sys.intern(self._check("gender", gender))
 
     def set_age(self, age):
-        self._age = age
+        self._age = self._check("age", age)
 
     def set_color(self, color):
-        self._color = color
+        self._color = sys.intern(self._check("color", color))
 
     def set_nickname(self, nickname):
-        self._nickname = nickname
+        self._nickname = self._check("nickname", nickname)
 
     def set_owner_phone(self, owner_phone):
-        self._owner_phone = owner_phone
+        self._owner_phone = self._check("owner_phone", owner_phone)
 
     def display_info(self):
         print(
@@ -145,22 +298,294 @@ class Pet:
         )
 
 
+class PetSearchIndex:
+    """Компактный индекс поиска подстроки во всех шести полях питомца.
+
+    Тип, пол, возраст и цвет принимают немного различных значений, поэтому
+    для них хранится словарь значение -> множество питомцев, а запрос
+    сверяется с каждым различным значением. Кличка и телефон почти уникальны:
+    для них хранятся списки триграмм в массивах. Питомец в индексе — это его
+    порядковый номер добавления, массивы отсортированы по номеру, поэтому
+    выдача сразу идёт в порядке добавления.
+
+    Строки дополняются по краям символом PAD, чтобы у каждой непустой строки
+    была триграмма и любой запрос из одного-двух символов входил в одну из них.
+    """
+
+    GRAM_SIZE = 3
+    PAD = "\x00"
+
+    def __init__(self, pets):
+        self._pets = pets  # pet_id -> Pet, по нему проверяются кандидаты длинных запросов
+        self._values = ({}, {}, {}, {})  # для типа, пола, возраста и цвета: значение -> номера
+        self._postings = {}  # триграмма клички или телефона -> array("I") номеров по возрастанию
+        self._order = {}  # pet_id -> номер добавления
+        self._ids = array.array("q")  # номер добавления -> pet_id, -1 у удалённых
+
+    @staticmethod
+    def _field_values(pet):
+        return (
+            pet.get_animal_type().lower(),
+            pet.get_gender().lower(),
+            str(pet.get_age()),
+            pet.get_color().lower(),
+        )
+
+    @classmethod
+    def _grams(cls, pet):
+        grams = set()
+        for text in (pet.get_nickname(), pet.get_owner_phone()):
+            if text:
+                text = f"{cls.PAD}{text.lower()}{cls.PAD}"
+                grams.update(text[i:i + cls.GRAM_SIZE] for i in range(len(text) - cls.GRAM_SIZE + 1))
+        return grams
+
+    @staticmethod
+    def _contains(postings, order):
+        i = bisect.bisect_left(postings, order)
+        return i < len(postings) and postings[i] == order
+
+    def add(self, pet, order=None):
+        """Добавляет питомца; order — прежний номер, чтобы сохранить место в выдаче."""
+        pet_id = pet.get_id()
+        if order is None:
+            order = len(self._ids)
+            self._ids.append(pet_id)
+        else:
+            self._ids[order] = pet_id
+        self._order[pet_id] = order
+        for values, value in zip(self._values, self._field_values(pet)):
+            values.setdefault(value, set()).add(order)
+        for gram in self._grams(pet):
+            postings = self._postings.get(gram)
+            if postings is None:
+                self._postings[gram] = array.array("I", (order,))
+            elif postings[-1] < order:
+                postings.append(order)
+            else:
+                bisect.insort(postings, order)
+
+    def remove(self, pet):
+        """Убирает питомца, пока его поля ещё прежние. Возвращает его номер или None."""
+        order = self._order.pop(pet.get_id(), None)
+        if order is None:
+            return None
+        self._ids[order] = -1
+        for values, value in zip(self._values, self._field_values(pet)):
+            members = values[value]
+            members.discard(order)
+            if not members:
+                del values[value]
+        for gram in self._grams(pet):
+            postings = self._postings[gram]
+            del postings[bisect.bisect_left(postings, order)]
+            if not postings:
+                del self._postings[gram]
+        return order
+
+    def search(self, query, limit=None, offset=0):
+        """Возвращает pet_id, у которых query входит хотя бы в одно поле, в порядке добавления."""
+        query = query.lower()
+        if not query:
+            # Пустая строка входит в любое поле
+            live = (pet_id for pet_id in self._ids if pet_id != -1)
+            return list(itertools.islice(live, offset, None if limit is None else offset + limit))
+        matched = set()
+        for values in self._values:
+            for value, members in values.items():
+                if query in value:
+                    matched.update(members)
+
+        candidates = ()  # Номера, которые ещё нужно сверить с кличкой и телефоном
+        if self.PAD in query:
+            candidates = [order for order, pet_id in enumerate(self._ids) if pet_id != -1]
+        elif len(query) < self.GRAM_SIZE:
+            for gram, postings in self._postings.items():
+                if query in gram:
+                    matched.update(postings)
+        elif len(query) == self.GRAM_SIZE:
+            matched.update(self._postings.get(query, ()))
+        else:
+            postings = sorted(
+                (
+                    self._postings.get(query[i:i + self.GRAM_SIZE], ())
+                    for i in range(len(query) - self.GRAM_SIZE + 1)
+                ),
+                key=len,
+            )
+            candidates = [
+                order
+                for order in postings[0]
+                if all(self._contains(other, order) for other in postings[1:])
+            ]
+        for order in candidates:
+            if order in matched:
+                continue
+            pet = self._pets[self._ids[order]]
+            # Триграммы могли совпасть в разных местах клички и телефона
+            if query in pet.get_nickname().lower() or query in pet.get_owner_phone().lower():
+                matched.add(order)
+
+        if limit is None:
+            ordered = sorted(matched)[offset:]
+        else:
+            ordered = heapq.nsmallest(offset + limit, matched)[offset:]
+        return [self._ids[order] for order in ordered]
+
+
+class SortedPetIndex:
+    """Индекс питомцев, упорядоченный по одному полю.
+
+    Элементы (значение, порядковый номер, pet_id) хранятся в отсортированных
+    блоках не длиннее 2 * LOAD, поэтому вставка и удаление стоят O(log n + LOAD),
+    а выборка первых k элементов или диапазона — O(log n + k).
+    """
+
+    LOAD = 1000
+
+    def __init__(self, key):
+        self._key = key
+        self._blocks = []
+        self._maxes = []  # Последний элемент каждого блока
+        self._entries = {}  # pet_id -> элемент
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, pet, order=None):
+        if order is None:
+            order = self._counter
+            self._counter += 1
+        entry = (self._key(pet), order, pet.get_id())
+        self._entries[entry[2]] = entry
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            return
+
+        i = bisect.bisect_left(self._maxes, entry)
+        if i == len(self._blocks):
+            i -= 1
+            self._blocks[i].append(entry)
+            self._maxes[i] = entry
+        else:
+            bisect.insort(self._blocks[i], entry)
+
+        block = self._blocks[i]
+        if len(block) > 2 * self.LOAD:
+            self._blocks[i:i + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._maxes[i:i + 1] = [block[self.LOAD - 1], block[-1]]
+
+    def remove(self, pet_id):
+        entry = self._entries.pop(pet_id, None)
+        if entry is None:
+            return None
+        i = bisect.bisect_left(self._maxes, entry)
+        block = self._blocks[i]
+        del block[bisect.bisect_left(block, entry)]
+        if not block:
+            del self._blocks[i]
+            del self._maxes[i]
+        elif self._maxes[i] == entry:
+            self._maxes[i] = block[-1]
+        return entry[1]
+
+    def update(self, pet):
+        """Переставляет изменённого питомца, сохраняя порядок среди равных значений."""
+        self.add(pet, self.remove(pet.get_id()))
+
+    def select(self, low=None, high=None, limit=None, reverse=False):
+        """Возвращает pet_id со значением поля в [low, high] в порядке сортировки."""
+        results = []
+        if not self._blocks or limit == 0:
+            return results
+
+        if not reverse:
+            i = 0 if low is None else bisect.bisect_left(self._maxes, (low,))
+            if i == len(self._blocks):
+                return results
+            j = 0 if low is None else bisect.bisect_left(self._blocks[i], (low,))
+            for block in self._blocks[i:]:
+                for entry in block[j:]:
+                    if high is not None and entry[0] > high:
+                        return results
+                    results.append(entry[2])
+                    if len(results) == limit:
+                        return results
+                j = 0
+        else:
+            i = len(self._blocks) - 1
+            j = len(self._blocks[i])
+            if high is not None:
+                i = min(bisect.bisect_right(self._maxes, (high, math.inf)), i)
+                j = bisect.bisect_right(self._blocks[i], (high, math.inf))
+            for block in reversed(self._blocks[:i + 1]):
+                for entry in reversed(block[:j]):
+                    if low is not None and entry[0] < low:
+                        return results
+                    results.append(entry[2])
+                    if len(results) == limit:
+                        return results
+                j = None
+        return results
+
+
 class PetManagementSystem:
-    def __init__(self):
-        self._users = []
-        self._pets = []
-        self.data_file = "pet_data.json"  # Имя файла для хранения данных
+    def __init__(
+        self,
+        data_file="pet_data.json",
+        storage_mode="snapshot",
+        compact_threshold=1000,
+        compact_interval=60,
+        hasher=None,
+    ):
+        self._users = {}  # Индекс пользователей по имени
+        self._pets = {}  # Индекс питомцев по pet_id
+        self._search_index = PetSearchIndex(self._pets)
+        self._sort_indexes = self._make_sort_indexes()
+        self._next_pet_id = 1  # Следующий свободный pet_id, только растёт
+        self.data_file = data_file  # Имя файла для хранения данных
+        # "snapshot" — каждое изменение перезаписывает файл целиком,
+        # "journal" — изменения дописываются в журнал и периодически сворачиваются в снимок
+        self.storage_mode = storage_mode
+        self.journal_file = f"{data_file}.journal"
+        self.compact_threshold = compact_threshold  # Записей в журнале до сжатия
+        self.compact_interval = compact_interval  # Секунд между фоновыми сжатиями
+        self._journal = None
+        self._journal_records = 0
+        self._storage_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._import_lock = threading.Lock()
+        self._compact_event = threading.Event()
+        self._compactor = None
+        self._closed = False
+        self.hasher = hasher or PasswordHasher()
         self.load_data()  # Загружаем данные при инициализации
+        if self.storage_mode == "journal":
+            self._start_journal()
 
     def load_data(self):
-        """Загружает данные из файла."""
-        if os.path.exists(self.data_file):
+        """Загружает данные из файла и воспроизводит журнал изменений.
+
+        Если файл не читается, он вместе с журналами откладывается с суффиксом
+        .damaged-<время> и запуск продолжается с данными по умолчанию: снимок
+        и журнал поверх частично загруженных данных означали бы их потерю.
+        """
+        file_existed = os.path.exists(self.data_file)
+        loaded = False
+        if file_existed:
             try:
                 with open(self.data_file, "r", encoding="utf-8") as f:
                     data = json.load(f)
 
-                self._users = [User.from_dict(user_data) for user_data in data.get("users", [])]
-                self._pets = [Pet.from_dict(pet_data) for pet_data in data.get("pets", [])]
+                self._clear()
+                for user_data in data.get("users", []):
+                    self._insert_user(User.from_dict(user_data))
+                for pet_data in data.get("pets", []):
+                    self._insert_pet(Pet.from_dict(pet_data))
+                self._next_pet_id = max(self._next_pet_id, data.get("next_pet_id", 1))
+                loaded = True
 
             except FileNotFoundError:
                 print(f"Файл {self.data_file} не найден.  Создается новый файл.")
@@ -169,36 +594,277 @@ class PetManagementSystem:
                 #  Можно предусмотреть создание нового файла или загрузку значений по умолчанию
             except Exception as e:
                 print(f"Произошла ошибка при загрузке данных: {e}")
-        else:
+            if not loaded:
+                self._set_aside_damaged()
+                file_existed = False
+        if not file_existed:
+            self._clear()
             self.load_default_data() # Если файл не существует, загружаем дефолтные данные
-            self.save_data()  # И сразу сохраняем, чтобы создать файл
+
+        # Если остался журнал, сразу сворачиваем его в снимок; новый файл тоже сохраняем
+        if self._replay_journal() or not file_existed:
+            self.save_data()
+
+    def _set_aside_damaged(self):
+        """Переименовывает нечитаемый файл данных и его журналы, ничего не удаляя."""
+        suffix = stamped = f".damaged-{time.strftime('%Y%m%d-%H%M%S')}"
+        attempt = 0
+        while os.path.exists(self.data_file + suffix):
+            attempt += 1
+            suffix = f"{stamped}-{attempt}"
+        for path in (self.data_file, self.journal_file, f"{self.journal_file}.compacting"):
+            if os.path.exists(path):
+                os.replace(path, path + suffix)
+        print(f"Данные из {self.data_file} сохранены в {self.data_file}{suffix}, начинаем с данных по умолчанию.")
 
     def save_data(self):
         """Сохраняет данные в файл."""
-        data = {
-            "users": [user.to_dict() for user in self._users],
-            "pets": [pet.to_dict() for pet in self._pets],
-        }
+        if self.storage_mode == "journal":
+            self.compact()
+            return
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)  # Красивый JSON
+            self._write_snapshot(self._snapshot(), indent=4)
+            for path in (self.journal_file, f"{self.journal_file}.compacting"):
+                if os.path.exists(path):
+                    os.remove(path)
         except Exception as e:
             print(f"Произошла ошибка при сохранении данных: {e}")
 
+    def _snapshot(self):
+        with self._storage_lock:
+            return {
+                "users": [user.to_dict() for user in self._users.values()],
+                "pets": [pet.to_dict() for pet in self._pets.values()],
+                "next_pet_id": self._next_pet_id,
+            }
+
+    def _write_snapshot(self, data, indent=None):
+        """Атомарно записывает снимок: сначала во временный файл, затем переименование."""
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            if indent is None:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, indent=indent, ensure_ascii=False)  # Красивый JSON
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+
+    def _record_change(self, record):
+        """Фиксирует одно изменение данных.
+
+        В режиме журнала запись дописывается одной компактной строкой, иначе
+        файл данных перезаписывается целиком.
+        """
+        self._record_changes([record])
+
+    def _record_changes(self, records):
+        """Фиксирует пачку изменений одной записью в журнал или одним сохранением."""
+        if self.storage_mode != "journal":
+            self.save_data()
+            return
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        try:
+            with self._storage_lock:
+                self._journal.write(lines)
+                self._journal.flush()
+                self._journal_records += len(records)
+                if self._journal_records >= self.compact_threshold:
+                    self._compact_event.set()
+        except Exception as e:
+            print(f"Произошла ошибка при записи в журнал: {e}")
+
+    def _replay_journal(self):
+        """Применяет к загруженному снимку записи журнала. Возвращает их количество."""
+        replayed = 0
+        # Журнал, который сворачивался в момент падения, старше текущего
+        for path in (f"{self.journal_file}.compacting", self.journal_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Недописанная при падении строка; после неё могут идти
+                        # записи, дописанные к журналу неудавшегося сжатия
+                        print(f"Пропущена повреждённая запись журнала {path}.")
+                        continue
+                    self._apply_record(record)
+                    replayed += 1
+        return replayed
+
+    def _apply_record(self, record):
+        op = record["op"]
+        if op == "put_user":
+            # Записи могут повторно применяться к снимку, где они уже учтены, поэтому
+            # всё держится на имени: переименование убирает старое имя, если оно есть,
+            # а пользователь с новым именем заменяется, а не добавляется вторым
+            user = User.from_dict(record["user"])
+            old_username = record.get("username")
+            if old_username is not None and old_username != user.get_username():
+                self._users.pop(old_username, None)
+            self._insert_user(user)
+        elif op == "put_pet":
+            pet = Pet.from_dict(record["pet"])
+            self._remove_pet(pet.get_id())
+            self._insert_pet(pet)
+        elif op == "delete_pet":
+            self._remove_pet(record["pet_id"])
+        elif op == "clear":
+            self._clear()
+        elif op == "reserve_pet_ids":
+            self._next_pet_id = max(self._next_pet_id, record["next_pet_id"])
+
+    @staticmethod
+    def _make_sort_indexes():
+        return {
+            "age": SortedPetIndex(Pet.get_age),
+            "animal_type": SortedPetIndex(Pet.get_animal_type),
+            "nickname": SortedPetIndex(Pet.get_nickname),
+            "id": SortedPetIndex(Pet.get_id),
+        }
+
+    # Словари и индексы меняются только под _storage_lock: под ним же фоновое
+    # сжатие журнала обходит их в _snapshot(). Запись об изменении вызывающий
+    # делает в той же критической секции, иначе порядок строк журнала может
+    # разойтись с порядком изменений и воспроизведение даст другое состояние
+
+    def _clear(self):
+        with self._storage_lock:
+            self._users = {}
+            self._pets = {}
+            self._search_index = PetSearchIndex(self._pets)
+            self._sort_indexes = self._make_sort_indexes()
+
+    def _insert_user(self, user):
+        with self._storage_lock:
+            self._users[user.get_username()] = user
+
+    def _insert_pet(self, pet):
+        with self._storage_lock:
+            self._pets[pet.get_id()] = pet
+            if pet.get_id() >= self._next_pet_id:
+                self._next_pet_id = pet.get_id() + 1
+            self._search_index.add(pet)
+            for index in self._sort_indexes.values():
+                index.add(pet)
+
+    def _remove_pet(self, pet_id):
+        """Удаляет питомца из хранилища и индексов. Возвращает его или None."""
+        with self._storage_lock:
+            pet = self._pets.pop(pet_id, None)
+            if pet is not None:
+                self._search_index.remove(pet)
+                for index in self._sort_indexes.values():
+                    index.remove(pet_id)
+        return pet
+
+    def _update_pet(self, pet, changes):
+        """Присваивает полям питомца значения из changes и обновляет индексы."""
+        # Проверяем все значения заранее, чтобы ошибка не оставила питомца изменённым наполовину
+        for field, value in changes.items():
+            Pet._check(field, value)
+        with self._storage_lock:
+            # Поисковый индекс находит записи питомца по прежним значениям полей
+            order = self._search_index.remove(pet)
+            for field, value in changes.items():
+                getattr(pet, f"set_{field}")(value)
+            self._search_index.add(pet, order)
+            for index in self._sort_indexes.values():
+                index.update(pet)
+            return pet.to_dict()
+
+    def _start_journal(self):
+        self._journal = open(self.journal_file, "a", encoding="utf-8")
+        self._compactor = threading.Thread(target=self._compaction_loop, daemon=True)
+        self._compactor.start()
+
+    def _compaction_loop(self):
+        while not self._closed:
+            self._compact_event.wait(self.compact_interval)
+            self._compact_event.clear()
+            if self._journal_records and not self._closed:
+                self.compact()
+
+    def compact(self):
+        """Сворачивает журнал в снимок.
+
+        Под блокировкой данных снимаются только копия состояния и ротация журнала,
+        запись снимка на диск идёт параллельно с новыми изменениями.
+        """
+        pending_file = f"{self.journal_file}.compacting"
+        with self._compact_lock:
+            with self._storage_lock:
+                data = self._snapshot()
+                if self._journal is not None:
+                    self._journal.close()
+                self._rotate_journal()
+                if self._journal is not None:
+                    self._journal = open(self.journal_file, "a", encoding="utf-8")
+                self._journal_records = 0
+            try:
+                self._write_snapshot(data)
+                if os.path.exists(pending_file):
+                    os.remove(pending_file)
+            except Exception as e:
+                print(f"Произошла ошибка при сжатии журнала: {e}")
+
+    def _rotate_journal(self):
+        """Переносит текущий журнал в .compacting; вызывается под обеими блокировками."""
+        pending_file = f"{self.journal_file}.compacting"
+        if os.path.exists(pending_file):
+            # Прошлое сжатие не удалось и его записей ещё нет в снимке на диске,
+            # поэтому текущий журнал дописываем к ним, а не затираем их
+            self._append_journal(pending_file)
+        elif os.path.exists(self.journal_file):
+            os.replace(self.journal_file, pending_file)
+
+    def _append_journal(self, pending_file):
+        with open(self.journal_file, "r", encoding="utf-8") as src:
+            lines = src.read()
+        with open(pending_file, "a+", encoding="utf-8") as dst:
+            # Последняя строка могла оборваться при падении — не склеиваем с ней новые
+            dst.seek(0, os.SEEK_END)
+            if dst.tell():
+                dst.seek(dst.tell() - 1)
+                if dst.read(1) != "\n":
+                    dst.write("\n")
+            dst.write(lines)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.journal_file)
+
+    def close(self):
+        """Останавливает пул bcrypt и фоновое сжатие, сворачивает остаток журнала."""
+        self.hasher.close()
+        if self.storage_mode != "journal" or self._closed:
+            return
+        self._closed = True
+        self._compact_event.set()
+        self._compactor.join()
+        self.compact()
+        with self._storage_lock:
+            self._journal.close()
+            self._journal = None
+
     def load_default_data(self):
         """Загружает дефолтные данные"""
-        self._users.append(Admin("admin", "123"))
-        self._users.append(User("user", "123"))
-        self._pets.append(
+        self._insert_user(Admin("admin", "123"))
+        self._insert_user(User("user", "123"))
+        self._insert_pet(
             Pet(1, "Собака", "Самец", 3, "Чёрный", "Шарик", "+7 999 123-45-67")
         )
-        self._pets.append(
+        self._insert_pet(
             Pet(2, "Кошка", "Самка", 2, "Белый", "Сакура", "+7 999 987-65-43")
         )
-        self._pets.append(
+        self._insert_pet(
             Pet(3, "Попугай", "Самец", 1, "Зелёный", "Кеша", "+7 999 456-78-90")
         )
-        self._pets.append(
+        self._insert_pet(
             Pet(4, "Кролик", "Самка", 4, "Серый", "Бан", "+7 999 321-09-87")
         )
 
@@ -209,17 +875,42 @@ class PetManagementSystem:
             return
 
         password = input("Введите пароль: ")
-        new_user = User(username, password)
-        self._users.append(new_user)
-        self.save_data()  # Сохраняем данные после регистрации
+        password_hash = self.hasher.hash_password(password).result()
+        new_user = User.from_hash(username, password_hash)
+        with self._storage_lock:
+            self._insert_user(new_user)
+            self._record_change({"op": "put_user", "user": new_user.to_dict()})
         print("Регистрация прошла успешно!")
 
+    def register_users(self, credentials, role="user"):
+        """Регистрирует пачку пользователей по парам (имя, пароль).
+
+        Пароли хешируются параллельно в пуле, изменения сохраняются одной записью.
+        Возвращает список зарегистрированных имён; занятые имена пропускаются.
+        """
+        credentials = [
+            (username, password)
+            for username, password in credentials
+            if username not in self._users
+        ]
+        hashes = self.hasher.hash_many(password for _, password in credentials)
+        user_cls = Admin if role == "admin" else User
+        changes = []
+        with self._storage_lock:
+            for (username, _), password_hash in zip(credentials, hashes):
+                user = user_cls.from_hash(username, password_hash, role)
+                self._insert_user(user)
+                changes.append({"op": "put_user", "user": user.to_dict()})
+            if changes:
+                self._record_changes(changes)
+        return [username for username, _ in credentials]
+
     def login(self):
         username = input("Введите имя пользователя: ")
         password = input("Введите пароль: ")
 
-        user = self.find_user(username)
-        if user and user.check_password(password):
+        user = self.authenticate(username, password)
+        if user:
             print(f"Добро пожаловать, {username}!")
             return user
 
@@ -227,28 +918,91 @@ class PetManagementSystem:
         return None
 
     def find_user(self, username):
-        for user in self._users:
-            if user.get_username() == username:
-                return user
-        return None
+        return self._users.get(username)
 
     def show_pets(self):
-        for pet in self._pets:
+        for pet in self._pets.values():
             pet.display_info()
 
-    def sort_pets(self, criterion):
+    def select_pets(self, criterion, limit=None, min_value=None, max_value=None, reverse=False):
+        """Возвращает питомцев, отсортированных по критерию.
+
+        min_value и max_value ограничивают диапазон значений (включительно),
+        limit — число питомцев. Для age, animal_type, nickname и id используются
+        поддерживаемые отсортированные индексы. Неизвестный критерий — AttributeError.
+        """
+        index = self._sort_indexes.get(criterion)
+        if index is not None:
+            return [
+                self._pets[pet_id]
+                for pet_id in index.select(min_value, max_value, limit, reverse)
+            ]
+        key = lambda pet: getattr(pet, f"get_{criterion}")()
+        return sorted(
+            (
+                pet
+                for pet in self._pets.values()
+                if (min_value is None or key(pet) >= min_value)
+                and (max_value is None or key(pet) <= max_value)
+            ),
+            key=key,
+            reverse=reverse,
+        )[:limit]
+
+    def sort_pets(self, criterion, limit=None, min_value=None, max_value=None, reverse=False):
+        """Выводит и возвращает питомцев, отсортированных по критерию (см. select_pets)."""
         try:
-            sorted_pets = sorted(
-                self._pets, key=lambda pet: getattr(pet, f"get_{criterion}")()
-            )
-            for pet in sorted_pets:
-                pet.display_info()
+            sorted_pets = self.select_pets(criterion, limit, min_value, max_value, reverse)
         except AttributeError:
             print("Неверный критерий сортировки.")
+            return []
+        for pet in sorted_pets:
+            pet.display_info()
+        return sorted_pets
+
+    def reserve_pet_ids(self, count, persist=True):
+        """Резервирует блок из count идущих подряд pet_id и возвращает его как range.
+
+        Зарезервированные номера не выдаются повторно и после перезапуска.
+        """
+        with self._storage_lock:
+            pet_ids = range(self._next_pet_id, self._next_pet_id + count)
+            self._next_pet_id += count
+            if persist:
+                self._record_change({"op": "reserve_pet_ids", "next_pet_id": self._next_pet_id})
+        return pet_ids
+
+    def add_pets(self, pets_data):
+        """Добавляет пачку питомцев за один вызов с одним сохранением.
+
+        pets_data — словари с полями animal_type, gender, age, color, nickname
+        и owner_phone. Возвращает созданных питомцев.
+        """
+        with self._storage_lock:
+            # Сначала создаём все объекты, чтобы ошибка в данных не оставила пачку наполовину
+            pets = [
+                Pet(
+                    self._next_pet_id + i,
+                    data["animal_type"],
+                    data["gender"],
+                    int(data["age"]),
+                    data["color"],
+                    data["nickname"],
+                    data["owner_phone"],
+                )
+                for i, data in enumerate(pets_data)
+            ]
+            self.reserve_pet_ids(len(pets), persist=False)
+            for pet in pets:
+                self._insert_pet(pet)
+            if pets:
+                self._record_changes(
+                    [{"op": "put_pet", "pet": pet.to_dict()} for pet in pets]
+                )
+        return pets
 
     def add_pet(self):
         try:
-            new_pet_id = max(pet.get_id() for pet in self._pets) + 1 if self._pets else 1
             animal_type = input("Введите тип животного: ")
             gender = input("Введите пол животного (Самец/Самка): ")
             age = int(input("Введите возраст животного: "))
@@ -256,11 +1010,13 @@ class PetManagementSystem:
             nickname = input("Введите кличку животного: ")
             owner_phone = input("Введите телефон владельца: ")
 
-            new_pet = Pet(
-                new_pet_id, animal_type, gender, age, color, nickname, owner_phone
-            )
-            self._pets.append(new_pet)
-            self.save_data()  # Сохраняем данные после добавления питомца
+            with self._storage_lock:
+                new_pet_id = self.reserve_pet_ids(1, persist=False)[0]
+                new_pet = Pet(
+                    new_pet_id, animal_type, gender, age, color, nickname, owner_phone
+                )
+                self._insert_pet(new_pet)
+                self._record_change({"op": "put_pet", "pet": new_pet.to_dict()})
             print("Питомец успешно добавлен!")
             return True
         except ValueError:
@@ -270,16 +1026,52 @@ class PetManagementSystem:
             print(f"Произошла ошибка: {e}")
             return False
 
+    def authenticate(self, username, password):
+        """Возвращает пользователя, если пароль верен, иначе None."""
+        user = self.find_user(username)
+        if user and self.hasher.check_password(password, user.get_password_hash()).result():
+            return user
+        return None
+
+    def create_pet(self, animal_type, gender, age, color, nickname, owner_phone):
+        """Добавляет одного питомца без диалога и возвращает его."""
+        return self.add_pets([{
+            "animal_type": animal_type,
+            "gender": gender,
+            "age": age,
+            "color": color,
+            "nickname": nickname,
+            "owner_phone": owner_phone,
+        }])[0]
+
+    EDITABLE_PET_FIELDS = ("animal_type", "gender", "age", "color", "nickname", "owner_phone")
+
+    def edit_pet(self, pet_id, **changes):
+        """Изменяет поля питомца без диалога. Возвращает питомца или None, если его нет."""
+        unknown = set(changes) - set(self.EDITABLE_PET_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        if "age" in changes:
+            changes["age"] = int(changes["age"])
+        with self._storage_lock:
+            pet = self._pets.get(pet_id)
+            if pet is None:
+                return None
+            self._record_change({"op": "put_pet", "pet": self._update_pet(pet, changes)})
+        return pet
+
+    def remove_pet(self, pet_id):
+        """Удаляет питомца без диалога. Возвращает True, если он был найден."""
+        with self._storage_lock:
+            if self._remove_pet(pet_id) is None:
+                return False
+            self._record_change({"op": "delete_pet", "pet_id": pet_id})
+        return True
+
     def delete_pet(self):
         try:
             pet_id_to_delete = int(input("Введите ID питомца для удаления: "))
-            original_length = len(self._pets)
-            self._pets[:] = [
-                pet for pet in self._pets if pet.get_id() != pet_id_to_delete
-            ]
-
-            if len(self._pets) < original_length:
-                self.save_data()  # Сохраняем данные после удаления
+            if self.remove_pet(pet_id_to_delete):
                 print(f"Питомец с ID {pet_id_to_delete} успешно удален!")
                 return True
             else:
@@ -296,46 +1088,46 @@ class PetManagementSystem:
     def update_pet(self):
         try:
             pet_id_to_update = int(input("Введите ID питомца для изменения: "))
-            for pet in self._pets:
-                if pet.get_id() == pet_id_to_update:
-                    print("Текущие характеристики:")
-                    pet.display_info()
-
-                    pet.set_animal_type(
-                        input(
-                            f"Введите новый тип животного ({pet.get_animal_type()}): "
-                        )
-                        or pet.get_animal_type()
-                    )
-                    pet.set_gender(
-                        input(f"Введите новый пол ({pet.get_gender()}): ")
-                        or pet.get_gender()
-                    )
-                    try:
-                        age = int(input(f"Введите новый возраст ({pet.get_age()}): "))
-                        pet.set_age(age)
-                    except ValueError:
-                        print("Неверный формат возраста. Возраст не изменён.")
-                    pet.set_color(
-                        input(f"Введите новый цвет ({pet.get_color()}): ")
-                        or pet.get_color()
-                    )
-                    pet.set_nickname(
-                        input(f"Введите новую кличку ({pet.get_nickname()}): ")
-                        or pet.get_nickname()
-                    )
-                    pet.set_owner_phone(
-                        input(
-                            f"Введите новый телефон ({pet.get_owner_phone()}): "
-                        )
-                        or pet.get_owner_phone()
-                    )
+            pet = self._pets.get(pet_id_to_update)
+            if pet is None:
+                print(f"Питомец с ID {pet_id_to_update} не найден.")
+                return False
 
-                    self.save_data()  # Сохраняем данные после обновления
-                    print("Характеристики питомца успешно обновлены!")
-                    return True
-            print(f"Питомец с ID {pet_id_to_update} не найден.")
-            return False
+            print("Текущие характеристики:")
+            pet.display_info()
+
+            # Значения собираем заранее, а присваиваем разом под блокировкой
+            changes = {
+                "animal_type": input(
+                    f"Введите новый тип животного ({pet.get_animal_type()}): "
+                )
+                or pet.get_animal_type(),
+                "gender": input(f"Введите новый пол ({pet.get_gender()}): ")
+                or pet.get_gender(),
+            }
+            try:
+                changes["age"] = int(input(f"Введите новый возраст ({pet.get_age()}): "))
+            except ValueError:
+                print("Неверный формат возраста. Возраст не изменён.")
+            changes["color"] = (
+                input(f"Введите новый цвет ({pet.get_color()}): ")
+                or pet.get_color()
+            )
+            changes["nickname"] = (
+                input(f"Введите новую кличку ({pet.get_nickname()}): ")
+                or pet.get_nickname()
+            )
+            changes["owner_phone"] = (
+                input(
+                    f"Введите новый телефон ({pet.get_owner_phone()}): "
+                )
+                or pet.get_owner_phone()
+            )
+
+            with self._storage_lock:
+                self._record_change({"op": "put_pet", "pet": self._update_pet(pet, changes)})
+            print("Характеристики питомца успешно обновлены!")
+            return True
         except ValueError:
             print("Ошибка: Неверный формат ID.")
             return False
@@ -343,31 +1135,36 @@ class PetManagementSystem:
             print(f"Произошла ошибка: {e}")
             return False
 
-    def search_pet_by_name(self, a):
-        a = a.lower()
-        results = []
-        for pet in self._pets:
-            if (
-                a in pet.get_animal_type().lower()
-                or a in pet.get_gender().lower()
-                or a in str(pet.get_age()).lower()
-                or a in pet.get_color().lower()
-                or a in pet.get_nickname().lower()
-                or a in pet.get_owner_phone().lower()
-            ):
-                results.append(pet)
-        return results
+    def search_pet_by_name(self, a, limit=None, offset=0):
+        """Ищет питомцев, у которых строка a входит в любое из шести полей.
+
+        limit и offset позволяют получать результаты постранично.
+        """
+        return [
+            self._pets[pet_id]
+            for pet_id in self._search_index.search(a, limit, offset)
+        ]
 
     def change_user_credentials(self, username, new_login=None, new_password=None):
         user = self.find_user(username)
         if user:
-            if new_login:
-                user.set_username(new_login)
+            password_hash = None
             if new_password:
-                user.update_password(
-                    user.check_password(new_password), new_password
-                )  # Обновляем хеш пароля
-            self.save_data()  # Сохраняем данные после изменения данных пользователя
+                # Хеш считаем до блокировки: bcrypt долгий
+                password_hash = self.hasher.hash_password(new_password).result()
+            with self._storage_lock:
+                if new_login and new_login != username:
+                    if new_login in self._users:
+                        return f"Пользователь '{new_login}' уже существует."
+                    del self._users[username]
+                    user.set_username(new_login)
+                    self._users[new_login] = user
+                if password_hash is not None:
+                    # Обновляем хеш пароля
+                    user.set_password_hash(password_hash)
+                self._record_change(
+                    {"op": "put_user", "username": username, "user": user.to_dict()}
+                )
             return f"Данные о пользователе '{username}' были обновлены!."
         return f"Пользователь '{username}' не найден."
 
@@ -384,8 +1181,11 @@ class PetManagementSystem:
             elif action == "3":
                 old_password = input("Введите старый пароль: ")
                 new_password = input("Введите новый пароль: ")
-                if user.update_password(old_password, new_password):
-                    self.save_data()  # Сохраняем данные после изменения пароля
+                if self.hasher.check_password(old_password, user.get_password_hash()).result():
+                    password_hash = self.hasher.hash_password(new_password).result()
+                    with self._storage_lock:
+                        user.set_password_hash(password_hash)
+                        self._record_change({"op": "put_user", "user": user.to_dict()})
                     print("Данные пользователя обновлены")
             elif action == "4":
                 a = input("Введите имя питомца, которого хотите найти:")
@@ -446,21 +1246,22 @@ class PetManagementSystem:
                 result = self.change_user_credentials(username, new_login, new_password)
                 print(result)
                 print("Обновленные пользователи:")
-                for user in self._users:
+                for user in self._users.values():
                     user.display_info()
             elif action == "6":
                 self.sort_pets("age")
             elif action == "7":
                 filename = input("Введите имя файла для импорта: ")
+                merge = input("Объединить с текущими данными? (д/н): ").lower() == "д"
                 try:
-                    self.import_data(filename)
+                    self.import_data(filename, merge=merge, progress=print_progress)
                     print("Импорт данных успешно завершен!")
                 except Exception as e:
                     print(f"Ошибка при импорте данных: {e}")
             elif action == "8":
                 filename = input("Введите имя файла для экспорта: ")
                 try:
-                    self.export_data(filename)
+                    self.export_data(filename, progress=print_progress)
                     print("Экспорт данных успешно завершен!")
                 except Exception as e:
                     print(f"Ошибка при экспорте данных: {e}")
@@ -469,50 +1270,889 @@ class PetManagementSystem:
             else:
                 print("Неверное действие.")
 
-    def export_data(self, filename):
-        data = {
-            "users": [user.to_dict() for user in self._users],
-            "pets": [pet.to_dict() for pet in self._pets],
-        }
+    def export_data(self, filename, progress=None, chunk_size=1000):
+        """Потоково экспортирует данные в JSON или NDJSON (по расширению файла).
+
+        Записи сериализуются по одной и сбрасываются на диск пачками по
+        chunk_size, progress(записано, всего) вызывается после каждой пачки.
+        """
+        ndjson = filename.endswith(NDJSON_EXTENSIONS)
+        with self._storage_lock:
+            # Копируем только ссылки: словари могут меняться во время экспорта
+            users = list(self._users.values())
+            pets = list(self._pets.values())
+        total = len(users) + len(pets)
+        written = 0
+        sections = (
+            ("users", "user", users),
+            ("pets", "pet", pets),
+        )
 
         try:
             with open(filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)  # Красивый JSON
-            print(f"Данные успешно экспортированы в JSON файл: {filename}")
+                if not ndjson:
+                    f.write("{\n")
+                for section_number, (section, kind, items) in enumerate(sections):
+                    if not ndjson:
+                        f.write(f'    "{section}": [')
+                    chunk = []
+                    for item_number, item in enumerate(items):
+                        record = item.to_dict()
+                        if ndjson:
+                            record = {"type": kind, **record}
+                            chunk.append(json.dumps(record, ensure_ascii=False) + "\n")
+                        else:
+                            separator = "," if item_number else ""
+                            chunk.append(
+                                f"{separator}\n        {json.dumps(record, ensure_ascii=False)}"
+                            )
+                        if len(chunk) >= chunk_size:
+                            f.write("".join(chunk))
+                            written += len(chunk)
+                            chunk = []
+                            if progress:
+                                progress(written, total)
+                    f.write("".join(chunk))
+                    written += len(chunk)
+                    if not ndjson:
+                        f.write("\n    ]" if items else "]")
+                        f.write(",\n" if section_number < len(sections) - 1 else "\n")
+                if not ndjson:
+                    f.write("}\n")
+            if progress:
+                progress(written, total)
+            print(f"Данные успешно экспортированы в файл: {filename}")
 
         except FileNotFoundError:
             print(f"Файл {filename} не найден.")
         except Exception as e:
             print(f"Произошла ошибка при экспорте: {e}")
 
-    def import_data(self, filename):
+    def import_data(self, filename, merge=False, progress=None, batch_size=1000):
+        """Потоково импортирует пользователей и питомцев из JSON или NDJSON.
+
+        Записи читаются и проверяются пачками по batch_size и сразу дописываются
+        в отдельный сегмент журнала, поэтому расход памяти не зависит от размера
+        файла. Только когда весь файл прочитан, сегмент атомарно становится
+        частью журнала и применяется к данным: обрезанный или повреждённый файл
+        ничего не меняет, а весь снимок заново не сохраняется. При merge=True
+        данные объединяются с текущими (совпадающие имена и pet_id заменяются),
+        иначе заменяют их. progress(обработано_записей) вызывается после каждой пачки.
+        """
+        segment_file = f"{self.journal_file}.import"
+        processed = skipped = 0
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # Очищаем текущие данные, чтобы не было дубликатов
-            self._users = []
-            self._pets = []
-
-            for user_data in data["users"]:
-                self._users.append(User.from_dict(user_data))
-
-            for pet_data in data["pets"]:
-                self._pets.append(Pet.from_dict(pet_data))
-            self.save_data() #Сохраняем данные после импорта
-            print(f"Данные успешно импортированы из JSON файла: {filename}")
+            with self._import_lock:
+                with open(filename, "r", encoding="utf-8") as f, \
+                        open(segment_file, "w", encoding="utf-8") as segment:
+                    if filename.endswith(NDJSON_EXTENSIONS):
+                        records = _iter_ndjson_records(f)
+                    else:
+                        records = _JsonStreamReader(f).records()
+                    if not merge:
+                        segment.write('{"op":"clear"}\n')
+
+                    batch = []
+                    for record in records:
+                        batch.append(record)
+                        if len(batch) < batch_size:
+                            continue
+                        skipped += self._import_batch(batch, segment)
+                        processed += len(batch)
+                        batch = []
+                        if progress:
+                            progress(processed)
+
+                    skipped += self._import_batch(batch, segment)
+                    processed += len(batch)
+                    if progress:
+                        progress(processed)
+                    segment.flush()
+                    os.fsync(segment.fileno())
+
+                self._commit_import(segment_file)
+            if skipped:
+                print(f"Пропущено некорректных записей: {skipped}")
+            print(f"Данные успешно импортированы из файла: {filename}")
 
         except FileNotFoundError:
             print(f"Файл {filename} не найден.")
         except json.JSONDecodeError:
             print(f"Ошибка: Некорректный формат JSON в файле {filename}.")
-        except KeyError as e:
-            print(f"Ошибка: Отсутствует ключ '{e}' в JSON файле.")
         except Exception as e:
             print(f"Произошла ошибка при импорте: {e}")
+        finally:
+            if os.path.exists(segment_file):
+                os.remove(segment_file)
+
+    def _commit_import(self, segment_file):
+        """Делает сегмент импорта частью журнала и применяет его к данным.
+
+        Текущий журнал уходит в цепочку перед сегментом, как при сжатии, а сегмент
+        атомарно переименовывается в журнал: после сбоя при запуске
+        воспроизводятся либо все записи импорта, либо ни одной.
+        """
+        with self._compact_lock, self._storage_lock:
+            if self._journal is not None:
+                self._journal.close()
+            self._rotate_journal()
+            os.replace(segment_file, self.journal_file)
+            applied = 0
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._apply_record(json.loads(line))
+                    applied += 1
+            if self._journal is not None:
+                self._journal = open(self.journal_file, "a", encoding="utf-8")
+                self._journal_records += applied
+                if self._journal_records >= self.compact_threshold:
+                    self._compact_event.set()
+
+    def _import_batch(self, batch, segment):
+        """Проверяет пачку записей и дописывает корректные в сегмент журнала.
+
+        Возвращает число пропущенных записей.
+
+        Пользователи с открытым паролем в поле password хешируются пачкой в пуле.
+        """
+        plain = [
+            data
+            for section, data in batch
+            if section == "users"
+            and isinstance(data, dict)
+            and "password_hash" not in data
+            and isinstance(data.get("password"), str)
+        ]
+        hashes = self.hasher.hash_many(data["password"] for data in plain)
+        for data, password_hash in zip(plain, hashes):
+            data["password_hash"] = password_hash.decode("utf-8")
+            del data["password"]
+
+        skipped = 0
+        lines = []
+        for section, data in batch:
+            try:
+                if section == "users":
+                    record = {"op": "put_user", "user": User.from_dict(data).to_dict()}
+                elif section == "pets":
+                    record = {"op": "put_pet", "pet": Pet.from_dict(data).to_dict()}
+                else:
+                    skipped += 1
+                    continue
+            except (KeyError, TypeError, AttributeError, ValueError):
+                skipped += 1
+                continue
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        segment.write("".join(lines))
+        return skipped
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+def print_progress(done, total=None):
+    suffix = f" из {total}" if total else ""
+    print(f"Обработано записей: {done}{suffix}")
+
+
+def _iter_ndjson_records(f):
+    """Читает NDJSON построчно, возвращая пары (раздел, запись)."""
+    sections = {"user": "users", "pet": "pets"}
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield sections.get(record.pop("type", None)), record
+
+
+class _JsonStreamReader:
+    """Потоковый разбор объекта вида {"users": [...], "pets": [...]}.
+
+    Элементы массивов декодируются по одному из буфера ограниченного размера,
+    поэтому файл не загружается в память целиком.
+    """
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """Пропускает пробелы и возвращает следующий символ ("" в конце файла)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Ожидался символ {char!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # Значение, упёршееся в конец буфера, может быть обрезано — дочитываем
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def records(self):
+        """Возвращает пары (раздел, запись) для каждого элемента массивов верхнего уровня."""
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            section = self._value()
+            self._expect(":")
+            if self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield section, self._value()
+                        if self._peek() != ",":
+                            break
+                        self._pos += 1
+                    self._expect("]")
+            else:
+                self._value()  # Посторонние поля пропускаем
+            if self._peek() != ",":
+                break
+            self._pos += 1
+        self._expect("}")
+
+class _ReadWriteLock:
+    """Асинхронная блокировка: чтения идут параллельно, записи — по одной.
+
+    Ожидающая запись не пропускает новые чтения, чтобы не голодать.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer and not self._waiting_writers
+            )
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class PetService:
+    """Асинхронный слой над PetManagementSystem для множества клиентов.
+
+    Чтения выполняются прямо в цикле событий и идут параллельно друг другу,
+    изменения — по одному в отдельном потоке, так как пишут на диск. bcrypt
+    уходит в пул процессов системы.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self._lock = _ReadWriteLock()
+        self._write_executor = concurrent.futures.ThreadPoolExecutor(1)
+        self._sessions = {}  # токен -> имя пользователя
+        self.active_connections = 0
+
+    async def login(self, username, password):
+        """Возвращает токен сессии или None при неверных данных."""
+        async with self._lock.read():
+            user = self.system.find_user(username)
+            password_hash = user.get_password_hash() if user else None
+        if password_hash is None:
+            return None
+        # Ожидание свободного места в пуле bcrypt блокирует, поэтому не в цикле событий
+        loop = asyncio.get_running_loop()
+        ok = await loop.run_in_executor(
+            None,
+            lambda: self.system.hasher.check_password(password, password_hash).result(),
+        )
+        if not ok:
+            return None
+        token = secrets.token_hex(16)
+        self._sessions[token] = username
+        return token
+
+    def logout(self, token):
+        """Завершает сессию. Возвращает False, если токен неизвестен."""
+        return self._sessions.pop(token, None) is not None
+
+    def _session_user(self, token, admin=False):
+        user = self.system.find_user(self._sessions.get(token))
+        if user is None:
+            raise PermissionError("Требуется авторизация.")
+        if admin and user.get_role() != "admin":
+            raise PermissionError("Недостаточно прав.")
+        return user
+
+    async def _write(self, fn, *args, **kwargs):
+        async with self._lock.write():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._write_executor, lambda: fn(*args, **kwargs)
+            )
+
+    async def search(self, token, query, limit=None, offset=0):
+        self._session_user(token)
+        async with self._lock.read():
+            return self.system.search_pet_by_name(query, limit, offset)
+
+    async def list_pets(self, token, criterion="id", limit=None, min_value=None, max_value=None, reverse=False):
+        self._session_user(token)
+        async with self._lock.read():
+            return self.system.select_pets(criterion, limit, min_value, max_value, reverse)
+
+    async def add(self, token, **fields):
+        self._session_user(token, admin=True)
+        return await self._write(self.system.create_pet, **fields)
+
+    async def update(self, token, pet_id, **changes):
+        self._session_user(token, admin=True)
+        return await self._write(self.system.edit_pet, pet_id, **changes)
+
+    async def delete(self, token, pet_id):
+        self._session_user(token, admin=True)
+        return await self._write(self.system.remove_pet, pet_id)
+
+    async def handle_request(self, request, tokens=None):
+        """Выполняет запрос протокола: {"action": ..., "token": ..., параметры}.
+
+        Токены, выданные действием login, добавляются в множество tokens, чтобы
+        соединение могло завершить свои сессии при закрытии.
+        """
+        try:
+            if not isinstance(request, dict):
+                return {"ok": False, "error": "Запрос должен быть JSON-объектом."}
+            request = dict(request)
+            action = request.pop("action", None)
+            if action == "login":
+                token = await self.login(request["username"], request["password"])
+                if token is None:
+                    return {"ok": False, "error": "Неверное имя пользователя или пароль."}
+                if tokens is not None:
+                    tokens.add(token)
+                return {"ok": True, "token": token}
+
+            token = request.pop("token", None)
+            if action == "logout":
+                if tokens is not None:
+                    tokens.discard(token)
+                if not self.logout(token):
+                    return {"ok": False, "error": "Сессия не найдена."}
+                return {"ok": True}
+            if action == "search":
+                result = await self.search(token, **request)
+            elif action == "list":
+                result = await self.list_pets(token, **request)
+            elif action == "add":
+                result = await self.add(token, **request)
+            elif action == "update":
+                result = await self.update(token, **request)
+            elif action == "delete":
+                return {"ok": True, "result": await self.delete(token, **request)}
+            else:
+                return {"ok": False, "error": f"Неизвестное действие: {action}"}
+
+            if isinstance(result, list):
+                return {"ok": True, "result": [pet.to_dict() for pet in result]}
+            if result is None:
+                return {"ok": False, "error": "Питомец не найден."}
+            return {"ok": True, "result": result.to_dict()}
+        except (PermissionError, AttributeError, KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+
+    async def handle_connection(self, reader, writer):
+        """Обслуживает одного клиента: JSON-запрос на строку, JSON-ответ на строку.
+
+        Сессии, открытые через соединение, живут не дольше него.
+        """
+        self.active_connections += 1
+        tokens = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.handle_request(json.loads(line), tokens)
+                except json.JSONDecodeError:
+                    response = {"ok": False, "error": "Некорректный JSON."}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.active_connections -= 1
+            for token in tokens:
+                self.logout(token)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=1 << 20)
+        print(f"Сервис питомцев слушает {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._write_executor.shutdown()
+
+
+def benchmark_load(user_counts=(1000, 10000, 50000)):
+    """Замеряет время загрузки файла с пользователями разного размера.
+
+    Все пользователи получают один заранее посчитанный хеш, поэтому время
+    загрузки зависит только от объёма прочитанных байт, а не от раундов bcrypt.
+    """
+    password_hash = bcrypt.hashpw(b"123", bcrypt.gensalt()).decode("utf-8")
+    print(f"{'Пользователей':>14} {'Размер, МБ':>12} {'Время, с':>10} {'МБ/с':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in user_counts:
+            data_file = os.path.join(tmp_dir, f"users_{count}.json")
+            data = {
+                "users": [
+                    {
+                        "username": f"user{i}",
+                        "password_hash": password_hash,
+                        "role": "admin" if i == 0 else "user",
+                    }
+                    for i in range(count)
+                ],
+                "pets": [],
+            }
+            with open(data_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            size_mb = os.path.getsize(data_file) / 1024 / 1024
+
+            start = time.perf_counter()
+            PetManagementSystem(data_file)
+            elapsed = time.perf_counter() - start
+            print(f"{count:>14} {size_mb:>12.2f} {elapsed:>10.3f} {size_mb / elapsed:>10.1f}")
+
+
+def benchmark_journal(pet_counts=(1000, 10000, 50000), edits=50):
+    """Сравнивает стоимость одного изменения в режимах snapshot и journal."""
+    print(f"{'Питомцев':>10} {'snapshot, мс':>14} {'journal, мс':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in pet_counts:
+            timings = []
+            for mode in ("snapshot", "journal"):
+                data_file = os.path.join(tmp_dir, f"pets_{mode}_{count}.json")
+                system = PetManagementSystem(
+                    data_file, storage_mode=mode, compact_threshold=edits * 10
+                )
+                for pet_id in range(5, count + 1):
+                    system._insert_pet(
+                        Pet(pet_id, "Кошка", "Самка", 2, "Белый", f"Кличка{pet_id}", "+7 999 000-00-00")
+                    )
+                system.save_data()
+
+                start = time.perf_counter()
+                for i in range(edits):
+                    pet = Pet(count + i + 1, "Собака", "Самец", 3, "Чёрный", "Шарик", "+7 999 123-45-67")
+                    system._insert_pet(pet)
+                    system._record_change({"op": "put_pet", "pet": pet.to_dict()})
+                timings.append((time.perf_counter() - start) / edits * 1000)
+                system.close()
+            print(f"{count:>10} {timings[0]:>14.3f} {timings[1]:>14.3f}")
+
+
+def benchmark_index(pet_count=1_000_000, user_count=100_000, lookups=200, deletes=20):
+    """Сравнивает линейный поиск по спискам с поиском по словарным индексам."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = PetManagementSystem(os.path.join(tmp_dir, "pets.json"))
+    password_hash = bcrypt.hashpw(b"123", bcrypt.gensalt())
+    for i in range(user_count):
+        system._insert_user(User.from_hash(f"user{i}", password_hash))
+    for pet_id in range(5, pet_count + 1):
+        system._insert_pet(
+            Pet(pet_id, "Кошка", "Самка", 2, "Белый", f"Кличка{pet_id}", "+7 999 000-00-00")
+        )
+    users_list = list(system._users.values())
+    pets_list = list(system._pets.values())
+    usernames = [f"user{i}" for i in range(0, user_count, user_count // lookups)]
+    pet_ids = list(range(pet_count, 5, -(pet_count // lookups)))
+
+    def measure(action, items):
+        start = time.perf_counter()
+        for item in items:
+            action(item)
+        return (time.perf_counter() - start) / len(items) * 1000
+
+    def scan_user(username):
+        for user in users_list:
+            if user.get_username() == username:
+                return user
+
+    def scan_pet(pet_id):
+        for pet in pets_list:
+            if pet.get_id() == pet_id:
+                return pet
+
+    def rebuild_without(pet_id):
+        pets_list[:] = [pet for pet in pets_list if pet.get_id() != pet_id]
+
+    rows = [
+        ("find_user", measure(scan_user, usernames), measure(system.find_user, usernames)),
+        ("поиск питомца", measure(scan_pet, pet_ids), measure(system._pets.get, pet_ids)),
+        (
+            "удаление питомца",
+            measure(rebuild_without, pet_ids[:deletes]),
+            measure(system._remove_pet, pet_ids[deletes:deletes * 2]),
+        ),
+    ]
+    print(f"Пользователей: {user_count}, питомцев: {len(system._pets)}")
+    print(f"{'Операция':<18} {'список, мс':>12} {'индекс, мс':>12}")
+    for name, old, new in rows:
+        print(f"{name:<18} {old:>12.4f} {new:>12.4f}")
+
+
+def benchmark_search(
+    pet_count=200_000,
+    queries=("к", "кли", "шарик", "собака", "самец", "7", "99", "999", "-45-", "кличка123", ""),
+):
+    """Сравнивает полный перебор питомцев по шести полям с поиском по индексу."""
+    animal_types = ("Собака", "Кошка", "Попугай", "Кролик", "Хомяк")
+    colors = ("Чёрный", "Белый", "Серый", "Рыжий", "Зелёный")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = PetManagementSystem(os.path.join(tmp_dir, "pets.json"))
+    start = time.perf_counter()
+    for pet_id in range(5, pet_count + 1):
+        system._insert_pet(
+            Pet(
+                pet_id,
+                animal_types[pet_id % len(animal_types)],
+                "Самец" if pet_id % 2 else "Самка",
+                pet_id % 20,
+                colors[pet_id % len(colors)],
+                f"Кличка{pet_id}",
+                f"+7 999 {pet_id % 1000:03d}-{pet_id % 100:02d}-{pet_id % 97:02d}",
+            )
+        )
+    print(f"Построение индекса для {len(system._pets)} питомцев: {time.perf_counter() - start:.2f} с")
+
+    def scan(a):
+        a = a.lower()
+        return [
+            pet
+            for pet in system._pets.values()
+            if a in pet.get_animal_type().lower()
+            or a in pet.get_gender().lower()
+            or a in str(pet.get_age()).lower()
+            or a in pet.get_color().lower()
+            or a in pet.get_nickname().lower()
+            or a in pet.get_owner_phone().lower()
+        ]
+
+    print(f"{'Запрос':<12} {'Найдено':>9} {'перебор, мс':>12} {'индекс, мс':>12} {'limit=20, мс':>13}")
+    for query in queries:
+        start = time.perf_counter()
+        expected = scan(query)
+        scan_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        found = system.search_pet_by_name(query)
+        index_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        page = system.search_pet_by_name(query, limit=20)
+        page_ms = (time.perf_counter() - start) * 1000
+        assert found == expected and page == expected[:20]
+        print(f"{query:<12} {len(found):>9} {scan_ms:>12.2f} {index_ms:>12.2f} {page_ms:>13.2f}")
+
+
+def benchmark_sort(pet_count=1_000_000, top_k=50, repeats=20):
+    """Сравнивает полную сортировку с выборкой из отсортированного индекса по возрасту."""
+    pets = [
+        Pet(pet_id, "Кошка", "Самка", (pet_id * 7919) % 30, "Белый", f"Кличка{pet_id}", "")
+        for pet_id in range(1, pet_count + 1)
+    ]
+    index = SortedPetIndex(Pet.get_age)
+    start = time.perf_counter()
+    for pet in pets:
+        index.add(pet)
+    print(f"Построение индекса для {pet_count} питомцев: {time.perf_counter() - start:.2f} с")
+
+    def measure(action):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result = action()
+        return result, (time.perf_counter() - start) / repeats * 1000
+
+    by_id = {pet.get_id(): pet for pet in pets}
+    full, full_ms = measure(lambda: sorted(pets, key=lambda pet: pet.get_age())[:top_k])
+    top, top_ms = measure(lambda: [by_id[i] for i in index.select(limit=top_k)])
+    ranged, range_ms = measure(lambda: index.select(10, 12, limit=top_k))
+    assert full == top
+
+    moved = pets[: repeats]
+    start = time.perf_counter()
+    for pet in moved:
+        index.remove(pet.get_id())
+        index.add(pet)
+    update_ms = (time.perf_counter() - start) / len(moved) * 1000
+
+    print(f"sorted() + срез {top_k}:          {full_ms:10.3f} мс")
+    print(f"{top_k} самых молодых из индекса: {top_ms:10.3f} мс")
+    print(f"возраст 10..12, limit {top_k}:     {range_ms:10.3f} мс")
+    print(f"удаление + вставка в индекс:    {update_ms:10.3f} мс")
+
+
+def benchmark_memory(pet_count=200_000):
+    """Сравнивает память на одного питомца до и после перехода на __slots__.
+
+    Питомец в системе хранится вместе с индексами поиска и сортировки,
+    поэтому их доля выводится отдельно и входит в итог.
+    """
+
+    class DictPet:
+        # Прежнее представление: обычный объект с __dict__ и без интернирования
+        def __init__(self, pet_id, animal_type, gender, age, color, nickname, owner_phone):
+            self._pet_id = pet_id
+            self._animal_type = animal_type
+            self._gender = gender
+            self._age = age
+            self._color = color
+            self._nickname = nickname
+            self._owner_phone = owner_phone
+
+    animal_types = ("Собака", "Кошка", "Попугай", "Кролик", "Хомяк")
+    colors = ("Чёрный", "Белый", "Серый", "Рыжий", "Зелёный")
+    # Как и при загрузке из файла, json создаёт отдельную строку для каждого значения
+    raw = json.dumps([
+        {
+            "pet_id": pet_id,
+            "animal_type": animal_types[pet_id % len(animal_types)],
+            "gender": "Самец" if pet_id % 2 else "Самка",
+            "age": pet_id % 20,
+            "color": colors[pet_id % len(colors)],
+            "nickname": f"Кличка{pet_id}",
+            "owner_phone": f"+7 999 {pet_id % 1000:03d}-{pet_id % 100:02d}-{pet_id % 97:02d}",
+        }
+        for pet_id in range(1, pet_count + 1)
+    ], ensure_ascii=False)
+
+    for name, pet_cls in (("__dict__", DictPet), ("__slots__", Pet)):
+        tracemalloc.start()
+        records = json.loads(raw)
+        pets = [
+            pet_cls(
+                data["pet_id"],
+                data["animal_type"],
+                data["gender"],
+                data["age"],
+                data["color"],
+                data["nickname"],
+                data["owner_phone"],
+            )
+            for data in records
+        ]
+        # Исходные словари больше не нужны — остаются только строки, на которые ссылаются питомцы
+        del records
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{name:<22} {used / pet_count:8.1f} байт на питомца")
+        del pets
+
+    total = used  # Последним замерен __slots__
+    pets = [Pet.from_dict(data) for data in json.loads(raw)]
+    indexes = [("индекс поиска", PetSearchIndex({pet.get_id(): pet for pet in pets}))]
+    indexes.extend(
+        (f"сортировка {key}", index)
+        for key, index in PetManagementSystem._make_sort_indexes().items()
+    )
+    for name, index in indexes:
+        tracemalloc.start()
+        for pet in pets:
+            index.add(pet)
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        total += used
+        print(f"{name:<22} {used / pet_count:8.1f} байт на питомца")
+    print(f"{'итого с индексами':<22} {total / pet_count:8.1f} байт на питомца")
+
+
+def benchmark_hashing(password_count=64, rounds=10):
+    """Сравнивает последовательное хеширование с пулом процессов."""
+    passwords = [f"password{i}" for i in range(password_count)]
+    start = time.perf_counter()
+    _hash_passwords(passwords, rounds)
+    sequential = time.perf_counter() - start
+
+    hasher = PasswordHasher(rounds=rounds)
+    hasher.hash_many(passwords[:hasher.workers])  # Прогрев процессов
+    start = time.perf_counter()
+    hashes = hasher.hash_many(passwords)
+    pooled = time.perf_counter() - start
+    assert all(hasher.check_many(zip(passwords, hashes)))
+    hasher.close()
+
+    print(f"Процессов: {hasher.workers}, rounds: {rounds}, паролей: {password_count}")
+    print(f"последовательно: {password_count / sequential:8.1f} хешей/с")
+    print(f"пул процессов:   {password_count / pooled:8.1f} хешей/с")
+
+
+def benchmark_bulk_add(pet_count=20_000):
+    """Сравнивает поштучное добавление с max() по всем id и пакетное add_pets."""
+    pet_data = {
+        "animal_type": "Кошка",
+        "gender": "Самка",
+        "age": 2,
+        "color": "Белый",
+        "nickname": "Сакура",
+        "owner_phone": "+7 999 987-65-43",
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        old = PetManagementSystem(os.path.join(tmp_dir, "old.json"))
+        start = time.perf_counter()
+        for _ in range(pet_count):
+            # Прежний add_pet без сохранения: поиск максимального id на каждой вставке
+            new_pet_id = max(old._pets) + 1 if old._pets else 1
+            old._insert_pet(Pet(new_pet_id, *pet_data.values()))
+        scan_seconds = time.perf_counter() - start
+
+        new = PetManagementSystem(os.path.join(tmp_dir, "new.json"), storage_mode="journal")
+        start = time.perf_counter()
+        new.add_pets(pet_data for _ in range(pet_count))
+        bulk_seconds = time.perf_counter() - start
+        new.close()
+
+    print(f"Питомцев: {pet_count}")
+    print(f"поштучно с max(), без сохранения: {scan_seconds:8.3f} с")
+    print(f"add_pets с сохранением в журнал:  {bulk_seconds:8.3f} с")
+
+
+def benchmark_service(sessions=500, requests_per_session=10):
+    """Нагрузочный тест TCP-сервиса: множество одновременных сессий на одной машине."""
+
+    async def client(port, latencies):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def call(request):
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            return response
+
+        token = (await call({"action": "login", "username": "user", "password": "123"}))["token"]
+        for i in range(requests_per_session):
+            if i % 2:
+                await call({"action": "search", "token": token, "query": "кош", "limit": 20})
+            else:
+                await call({"action": "list", "token": token, "criterion": "age", "limit": 20})
+        writer.close()
+        await writer.wait_closed()
+
+    async def run(system):
+        service = PetService(system)
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(port, latencies) for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+        while service.active_connections:
+            await asyncio.sleep(0.01)
+        server.close()
+        await server.wait_closed()
+        service.close()
+        latencies.sort()
+        print(f"Сессий: {sessions}, запросов: {len(latencies)}, время: {elapsed:.2f} с")
+        print(f"{len(latencies) / elapsed:.0f} запросов/с, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Низкая стоимость bcrypt, чтобы тест мерил сервис, а не хеширование
+        system = PetManagementSystem(
+            os.path.join(tmp_dir, "pets.json"), hasher=PasswordHasher(rounds=4)
+        )
+        system._insert_user(User.from_hash("user", bcrypt.hashpw(b"123", bcrypt.gensalt(4))))
+        system.add_pets(
+            {
+                "animal_type": "Кошка",
+                "gender": "Самка",
+                "age": i % 20,
+                "color": "Белый",
+                "nickname": f"Кличка{i}",
+                "owner_phone": "+7 999 000-00-00",
+            }
+            for i in range(10000)
+        )
+        asyncio.run(run(system))
+        system.close()
+
+
+BENCHMARKS = {
+    "load": benchmark_load,
+    "journal": benchmark_journal,
+    "index": benchmark_index,
+    "search": benchmark_search,
+    "sort": benchmark_sort,
+    "memory": benchmark_memory,
+    "hashing": benchmark_hashing,
+    "bulk_add": benchmark_bulk_add,
+    "service": benchmark_service,
+}
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench":
+        BENCHMARKS[sys.argv[2]]()
+        sys.exit()
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        system = PetManagementSystem(storage_mode="journal")
+        service = PetService(system)
+        try:
+            asyncio.run(service.serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+            system.close()
+        sys.exit()
+
     system = PetManagementSystem()
 
     while True:
@@ -530,6 +2170,7 @@ if __name__ == "__main__":
                 else:
                     system.user_menu(user)
         elif action == "0":
+            system.close()
             print("Вы вышли из программы.")
             break
         else:
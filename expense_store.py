@@ -0,0 +1,651 @@
+"""Компактное колоночное хранилище расходов для mnogopot4 и mpmp4.
+
+Вместо списка словарей каждое поле лежит в своём столбце:
+
+    amounts.f64        суммы, float64
+    times.i64          время, секунды от эпохи (UTC), int64
+    categories.i32     коды категорий, int32; сами названия — в meta.json
+    descriptions.end   конец описания каждой строки в куче, int64
+    descriptions.heap  описания в UTF-8 подряд, без разделителей
+    time.idx           номера строк по возрастанию времени, int64
+    category<N>.idx    номера строк категории N по возрастанию времени, int64
+    meta.json          число строк, размер кучи, словарь категорий и агрегаты
+
+Индекс, переписанный целиком (вставка в середину), сохраняется под новым
+именем time.<G>.idx / category<N>.<G>.idx, а поколение G записывается
+в meta.json: до замены meta.json открывается прежний файл индекса.
+
+Числа записаны в порядке байт машины. При открытии столбцы отображаются
+в память через mmap, поэтому загрузка не читает файлы целиком; новые
+строки копятся в массивах в памяти и дописываются в конец файлов.
+meta.json заменяется атомарно после записи столбцов, так что недописанный
+после сбоя хвост столбцов просто игнорируется.
+"""
+
+import array
+import bisect
+import calendar
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+META_FILE = "meta.json"
+
+
+def _index_name(name, generation):
+    return f"{name}.idx" if not generation else f"{name}.{generation}.idx"
+
+
+def parse_timestamp(value, end_of_day=False):
+    """Переводит "ГГГГ-ММ-ДД[ ЧЧ:ММ:СС]" в секунды от эпохи (время считается UTC)."""
+    if len(value) == 10:
+        value += " 23:59:59" if end_of_day else " 00:00:00"
+    return calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19])))
+
+
+def format_timestamp(moment):
+    """Обратное к parse_timestamp: секунды от эпохи в "ГГГГ-ММ-ДД ЧЧ:ММ:СС"."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(moment))
+
+
+def import_expenses(store, expenses):
+    """Добавляет в store расходы прежнего формата, пропуская некорректные.
+
+    Возвращает число пропущенных расходов, чтобы вызывающий мог о них сообщить.
+    """
+    skipped = 0
+    for expense in expenses:
+        try:
+            store.append(expense)
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+    return skipped
+
+
+def open_store(directory, load_legacy, report):
+    """Открывает хранилище directory, при первом запуске перенося в него расходы.
+
+    load_legacy() возвращает расходы прежнего формата (пустой список — переносить
+    нечего); report(level, message) сообщает о проблемах. Перенос идёт во
+    временный каталог рядом с directory, который переименовывается в него только
+    после записи всех строк: сбой посреди переноса не оставляет полупустого
+    хранилища, и при следующем запуске перенос просто повторится. Повреждённое
+    хранилище откладывается в directory.damaged-<время>.
+    """
+    store = None
+    if os.path.isdir(directory):
+        try:
+            store = ExpenseStore(directory)
+        except (ValueError, FileNotFoundError):
+            damaged = stamped = f"{directory}.damaged-{time.strftime('%Y%m%d-%H%M%S')}"
+            for attempt in itertools.count(1):
+                if not os.path.exists(damaged):
+                    break
+                damaged = f"{stamped}-{attempt}"
+            os.replace(directory, damaged)
+            report("ERROR", f"Хранилище расходов повреждено и сохранено в {damaged}. Начинаем с чистого листа.")
+    if store is not None and len(store):
+        return store
+    legacy = load_legacy()
+    if not legacy:
+        return store or ExpenseStore(directory)
+    if store is not None:
+        # Пустой каталог, например оставшийся от прерванного переноса
+        store.close()
+        shutil.rmtree(directory)
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(directory) + ".", suffix=".tmp",
+                               dir=os.path.dirname(directory) or ".")
+    try:
+        migrated = ExpenseStore(tmp_dir)
+        skipped = import_expenses(migrated, legacy)
+        migrated.write(migrated.snapshot())
+        migrated.close()
+        os.replace(tmp_dir, directory)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if skipped:
+        report("WARNING", f"Пропущено некорректных расходов: {skipped}")
+    report("INFO", f"Расходы прежнего формата перенесены в {directory}")
+    return ExpenseStore(directory)
+
+
+class _Column:
+    """Столбец одного типа: сохранённая часть через mmap и дописанный хвост в памяти.
+
+    written — сколько элементов уже отдано на запись; rewrite — файл нужно
+    переписать целиком (была вставка в середину уже записанной части).
+    """
+
+    def __init__(self, path, typecode, rows=0):
+        self.path = path
+        self.typecode = typecode
+        self.tail = array.array(typecode)
+        self.itemsize = self.tail.itemsize
+        self._map = None
+        self.base = memoryview(b"").cast(typecode)
+        if rows:
+            with open(path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self._map) < rows * self.itemsize:
+                self._map.close()
+                raise ValueError(f"Файл {path} короче, чем указано в {META_FILE}")
+            self.base = memoryview(self._map)[:rows * self.itemsize].cast(typecode)
+        self.written = rows
+        self.rewrite = False
+
+    def __len__(self):
+        return len(self.base) + len(self.tail)
+
+    def __getitem__(self, i):
+        base = len(self.base)
+        return self.base[i] if i < base else self.tail[i - base]
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def insert(self, i, value):
+        if i < len(self.base):
+            # Вставка в отображённую часть: переносим столбец в память
+            self.tail = self.range(0, len(self))
+            self._release()
+        if i < self.written:
+            self.rewrite = True
+        self.tail.insert(i - len(self.base), value)
+
+    def range(self, start, end):
+        """Элементы [start, end) одним массивом."""
+        base = len(self.base)
+        result = array.array(self.typecode)
+        if start < base:
+            result.frombytes(self.base[start:min(end, base)].cast("B"))
+        if end > base:
+            result.extend(self.tail[max(start, base) - base:end - base])
+        return result
+
+    def slice(self, start, end):
+        """Байты элементов [start, end); диапазон не пересекает границу base/tail."""
+        base = len(self.base)
+        if end <= base:
+            return self.base[start:end].tobytes()
+        return self.tail[start - base:end - base].tobytes()
+
+    def pending(self):
+        """Под блокировкой владельца: что дописать в файл, чтобы он совпал со столбцом."""
+        count = len(self)
+        if self.rewrite:
+            self.rewrite = False
+            start, data = 0, self.range(0, count).tobytes()
+        else:
+            base = len(self.base)
+            start, data = self.written, self.tail[self.written - base:count - base].tobytes()
+        rewrite = start == 0
+        self.written = count
+        return rewrite, start, data
+
+    def store(self, rewrite, start, data):
+        """Записывает результат pending(); вызывается без блокировки владельца."""
+        if rewrite:
+            # Старый файл может быть отображён в память, поэтому подменяем его, а не пишем поверх
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            return
+        with open(self.path, "ab") as f:
+            # Отрезаем то, что осталось от прерванной записи
+            f.truncate(start * self.itemsize)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _release(self):
+        self.base.release()
+        self.base = memoryview(b"").cast(self.typecode)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self):
+        self._release()
+
+
+class _TimeKeys:
+    """Время строк в порядке индекса — чтобы искать по индексу через bisect."""
+
+    def __init__(self, times, index):
+        self.times = times
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        return self.times[self.index[i]]
+
+
+class ExpenseStore:
+    """Расходы в колоночном виде в каталоге directory.
+
+    Снаружи выглядит как последовательность словарей {"amount", "category",
+    "description", "timestamp"}: store[i], len(store), итерация. Словарь
+    собирается при обращении, в памяти хранятся только столбцы. Вызовы
+    append(), select(), count(), period_totals() и snapshot() должен
+    сериализовать владелец; write() выполняется без его блокировки.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta = self._read_meta()
+        rows = meta["rows"]
+        self.categories = meta["categories"]
+        self._codes = {category: code for code, category in enumerate(self.categories)}
+        self.amounts = _Column(self._path("amounts.f64"), "d", rows)
+        self.times = _Column(self._path("times.i64"), "q", rows)
+        self.codes = _Column(self._path("categories.i32"), "i", rows)
+        self.description_ends = _Column(self._path("descriptions.end"), "q", rows)
+        self.heap = _Column(self._path("descriptions.heap"), "B", meta["heap_bytes"])
+        # Итоги по категориям и по дням/месяцам хранятся в meta.json, чтобы
+        # отчёты после загрузки не проходили по всем строкам
+        self.category_stats = meta["category_stats"]
+        self.daily_totals = meta["daily_totals"]
+        self.monthly_totals = meta["monthly_totals"]
+        self._days = sorted(self.daily_totals)
+        indexed = meta["indexed"] == rows
+        generations = meta["index_generations"]
+        generations += [0] * (len(self.categories) + 1 - len(generations))
+        self.time_index = self._index_column("time", generations[0], rows if indexed else 0)
+        self.category_indexes = [
+            self._index_column(f"category{code}", generations[code + 1],
+                               meta["category_rows"][code] if indexed else 0)
+            for code in range(len(self.categories))
+        ]
+        if not indexed:
+            self._rebuild_indexes()
+        self._remove_stale_indexes()
+        self.persisted = rows
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _index_column(self, name, generation=0, rows=0):
+        column = _Column(self._path(_index_name(name, generation)), "q", rows)
+        column.name = name
+        column.generation = generation
+        return column
+
+    def _remove_stale_indexes(self):
+        """Удаляет файлы индексов прошлых поколений, оставшиеся после сбоя или замены."""
+        current = {os.path.basename(index.path) for index in (self.time_index, *self.category_indexes)}
+        for name in os.listdir(self.directory):
+            if name.endswith(".idx") and name not in current:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    # Файл ещё отображён в память (Windows) — удалим при следующем открытии
+                    pass
+
+    def _read_meta(self):
+        meta = {
+            "rows": 0, "heap_bytes": 0, "categories": [], "indexed": 0, "category_rows": [],
+            "index_generations": [],
+            "category_stats": {}, "daily_totals": {}, "monthly_totals": {},
+        }
+        try:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                meta.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        return meta
+
+    def _rebuild_indexes(self):
+        # Индексы потеряны или не совпадают со столбцами — строим заново и перепишем целиком
+        order = sorted(range(len(self)), key=self.times.__getitem__)
+        self.time_index.tail = array.array("q", order)
+        positions = [array.array("q") for _ in self.categories]
+        for position in order:
+            positions[self.codes[position]].append(position)
+        for index, category_positions in zip(self.category_indexes, positions):
+            index.tail = category_positions
+        for index in (self.time_index, *self.category_indexes):
+            index.rewrite = True
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("номер расхода вне диапазона")
+        start = self.description_ends[position - 1] if position else 0
+        return {
+            "amount": self.amounts[position],
+            "category": self.categories[self.codes[position]],
+            "description": self.heap.slice(start, self.description_ends[position]).decode("utf-8"),
+            "timestamp": format_timestamp(self.times[position]),
+        }
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def append(self, expense):
+        """Добавляет расход-словарь; возвращает его номер.
+
+        Все поля проверяются до изменения столбцов: некорректный расход
+        (KeyError, TypeError, ValueError) не оставляет строку наполовину.
+        """
+        amount = float(expense["amount"])
+        category = expense["category"]
+        timestamp = expense["timestamp"]
+        description = expense.get("description") or ""
+        if not all(isinstance(value, str) for value in (category, timestamp, description)):
+            raise TypeError("Категория, описание и время расхода должны быть строками")
+        moment = parse_timestamp(timestamp)
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self.categories)
+            self.categories.append(category)
+            self.category_indexes.append(self._index_column(f"category{code}"))
+        position = len(self)
+        self.amounts.append(amount)
+        self.times.append(moment)
+        self.codes.append(code)
+        self.heap.tail.frombytes(description.encode("utf-8"))
+        self.description_ends.append(len(self.heap))
+        self._account(category, amount, timestamp[:10])
+        for index in (self.time_index, self.category_indexes[code]):
+            # Новые расходы почти всегда самые поздние, поэтому вставка обычно в конец
+            if not len(index) or self.times[index[len(index) - 1]] <= moment:
+                index.append(position)
+            else:
+                index.insert(bisect.bisect_right(_TimeKeys(self.times, index), moment), position)
+        return position
+
+    def _account(self, category, amount, day):
+        stats = self.category_stats.get(category)
+        if stats is None:
+            self.category_stats[category] = {"sum": amount, "count": 1, "min": amount, "max": amount}
+        else:
+            stats["sum"] += amount
+            stats["count"] += 1
+            stats["min"] = min(stats["min"], amount)
+            stats["max"] = max(stats["max"], amount)
+        if day not in self.daily_totals:
+            self.daily_totals[day] = {}
+            bisect.insort(self._days, day)
+        totals = self.daily_totals[day]
+        totals[category] = totals.get(category, 0) + amount
+        totals = self.monthly_totals.setdefault(day[:7], {})
+        totals[category] = totals.get(category, 0) + amount
+
+    def _bounds(self, start, end, category):
+        low = parse_timestamp(start) if start else None
+        high = parse_timestamp(end, end_of_day=True) if end else None
+        if category is None:
+            index = self.time_index
+        elif category in self._codes:
+            index = self.category_indexes[self._codes[category]]
+        else:
+            return None, 0, 0
+        keys = _TimeKeys(self.times, index)
+        first = bisect.bisect_left(keys, low) if low is not None else 0
+        last = bisect.bisect_right(keys, high) if high is not None else len(index)
+        return index, first, max(first, last)
+
+    def select(self, start=None, end=None, category=None, offset=0, limit=None):
+        """Номера расходов по возрастанию времени в диапазоне [start, end] и, если
+        задана, в одной категории; offset и limit задают страницу."""
+        index, first, last = self._bounds(start, end, category)
+        if index is None:
+            return array.array("q")
+        first = min(last, first + offset)
+        if limit is not None:
+            last = min(last, first + limit)
+        return index.range(first, last)
+
+    def count(self, start=None, end=None, category=None):
+        """Количество расходов, подходящих под select(), за O(log n)."""
+        _, first, last = self._bounds(start, end, category)
+        return last - first
+
+    def period_totals(self, start_date, end_date, by="day"):
+        """Суммы по категориям за каждый день (by="day") или месяц (by="month")
+        в диапазоне дат ГГГГ-ММ-ДД включительно."""
+        if by == "month":
+            return {month: dict(totals) for month, totals in sorted(self.monthly_totals.items())
+                    if start_date[:7] <= month <= end_date[:7]}
+        first = bisect.bisect_left(self._days, start_date)
+        last = bisect.bisect_right(self._days, end_date)
+        return {day: dict(self.daily_totals[day]) for day in self._days[first:last]}
+
+    def snapshot(self):
+        """Копирует всё несохранённое; вызывается под блокировкой владельца.
+
+        Время пропорционально числу новых строк плюс размеру агрегатов: итоги
+        по категориям, дням и месяцам сериализуются в meta.json целиком.
+        """
+        rows = len(self)
+        indexes = (self.time_index, *self.category_indexes)
+        for index in indexes:
+            if index.rewrite:
+                # Переписанный индекс пишется в новый файл, иначе после сбоя до замены
+                # meta.json открылся бы новый порядок строк со старым их числом
+                index.generation += 1
+                index.path = self._path(_index_name(index.name, index.generation))
+        columns = [
+            (column, *column.pending())
+            for column in (self.amounts, self.times, self.codes, self.description_ends, self.heap,
+                           self.time_index, *self.category_indexes)
+        ]
+        meta = json.dumps({
+            "version": 1,
+            "rows": rows,
+            "heap_bytes": len(self.heap),
+            "categories": self.categories,
+            "indexed": rows,
+            "category_rows": [len(index) for index in self.category_indexes],
+            "index_generations": [index.generation for index in indexes],
+            "category_stats": self.category_stats,
+            "daily_totals": self.daily_totals,
+            "monthly_totals": self.monthly_totals,
+        }, ensure_ascii=False)
+        return rows, columns, meta
+
+    def write(self, snapshot):
+        """Дописывает столбцы из snapshot() и атомарно заменяет meta.json."""
+        rows, columns, meta = snapshot
+        try:
+            for column, rewrite, start, data in columns:
+                column.store(rewrite, start, data)
+            tmp_path = self._path(META_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(meta)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(META_FILE))
+            self._remove_stale_indexes()
+        except OSError:
+            # Неизвестно, что успело попасть на диск, — в следующий раз переписываем целиком
+            for column, _, _, _ in columns:
+                column.rewrite = True
+            raise
+        self.persisted = rows
+
+    def close(self):
+        for column in (self.amounts, self.times, self.codes, self.description_ends, self.heap,
+                       self.time_index, *self.category_indexes):
+            column.close()
+
+
+class ExpenseQueries:
+    """Запросы и отчёты по расходам, общие для менеджеров mnogopot4 и mpmp4.
+
+    Класс-примесь: владелец задаёт self.expenses (ExpenseStore) и self.lock,
+    которым сериализует доступ к хранилищу.
+    """
+
+    # Сколько расходов копируется из хранилища за одно взятие self.lock
+    ROWS_CHUNK = 256
+
+    def query(self, start=None, end=None, category=None, offset=0, limit=None):
+        """Расходы по возрастанию времени в диапазоне [start, end] и, если задана,
+        в одной категории. start и end — строки "ГГГГ-ММ-ДД[ ЧЧ:ММ:СС]"; дата без
+        времени в end означает конец дня. Результат выдаётся генератором,
+        offset и limit задают страницу.
+        """
+        with self.lock:
+            selected = self.expenses.select(start, end, category, offset, limit)
+        return self._rows(selected)
+
+    def count(self, start=None, end=None, category=None):
+        """Количество расходов, подходящих под query(), за O(log n)."""
+        with self.lock:
+            return self.expenses.count(start, end, category)
+
+    def period_totals(self, start_date, end_date, by="day"):
+        """Суммы по категориям за каждый день (by="day") или месяц (by="month")
+        в диапазоне дат ГГГГ-ММ-ДД включительно."""
+        with self.lock:
+            return self.expenses.period_totals(start_date, end_date, by)
+
+    def _rows(self, positions):
+        # Строки копируются под self.lock порциями: add_expense в это время
+        # может перестраивать столбцы хранилища, а вывод идёт без блокировки
+        for first in range(0, len(positions), self.ROWS_CHUNK):
+            with self.lock:
+                rows = [self.expenses[position] for position in positions[first:first + self.ROWS_CHUNK]]
+            yield from rows
+
+    @staticmethod
+    def _format_expense(number, expense):
+        return f"{number}. {expense['timestamp']} - {expense['amount']} ({expense['category']}) - {expense['description']}"
+
+    def _print_report(self):
+        with self.lock:
+            report = {category: dict(stats) for category, stats in self.expenses.category_stats.items()}
+
+        print("\n--- Отчет по расходам ---")
+        total_spending = 0
+        for category, stats in report.items():
+            print(f"{category}: {stats['sum']} (записей: {stats['count']}, мин: {stats['min']}, макс: {stats['max']})")
+            total_spending += stats["sum"]
+        print(f"----\nВсего потрачено: {total_spending}")
+
+    def _print_period_report(self, start_date, end_date, by="day"):
+        print(f"\n--- Отчет за период {start_date} — {end_date} ---")
+        total_spending = 0
+        for bucket, totals in self.period_totals(start_date, end_date, by).items():
+            bucket_total = sum(totals.values())
+            details = ", ".join(f"{category}: {total}" for category, total in totals.items())
+            print(f"{bucket}: {bucket_total} ({details})")
+            total_spending += bucket_total
+        print(f"----\nВсего потрачено за период: {total_spending}")
+
+    def _print_query(self, start=None, end=None, category=None, page_size=20):
+        """Выводит найденные расходы страницами; возвращает их количество."""
+        total = self.count(start, end, category)
+        print(f"\n--- Найдено расходов: {total} ---")
+        results = self.query(start, end, category)
+        shown = 0
+        while True:
+            page = list(itertools.islice(results, page_size))
+            for expense in page:
+                shown += 1
+                print(self._format_expense(shown, expense))
+            if len(page) < page_size or shown >= total or input("Показать ещё? (д/н): ").strip().lower() != "д":
+                break
+        return total
+
+    def _print_expenses(self):
+        print("\n--- Список расходов ---")
+        with self.lock:
+            total = len(self.expenses)
+        for number, expense in enumerate(self._rows(range(total)), 1):
+            print(self._format_expense(number, expense))
+        if not total:
+            print("Расходы отсутствуют.")
+
+
+def _measure_load(directory, results):
+    # Запускается в отдельном процессе, чтобы RSS относился только к загрузке
+    start = time.perf_counter()
+    if directory.endswith(".json"):
+        with open(directory, "r", encoding="utf-8") as f:
+            expenses = json.load(f)
+        rows = len(expenses)
+    else:
+        store = ExpenseStore(directory)
+        rows = len(store)
+    elapsed = time.perf_counter() - start
+    with open("/proc/self/statm") as f:
+        rss = int(f.read().split()[1]) * mmap.PAGESIZE
+    results.put((rows, elapsed, rss / 1024 / 1024))
+
+
+def benchmark_load(count=10_000_000, json_count=1_000_000):
+    """Время загрузки и RSS колоночного хранилища на count расходах
+    и, для сравнения, прежнего JSON со списком словарей на json_count."""
+    categories = ("Еда", "Транспорт", "Жильё", "Связь", "Досуг", "Здоровье", "Одежда", "Подарки")
+    first_moment = parse_timestamp("2015-01-01")
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, "expenses.store")
+        store = ExpenseStore(directory)
+        start = time.perf_counter()
+        for i in range(count):
+            store.append({
+                "amount": (i * 7919) % 100000 / 100,
+                "category": categories[i % len(categories)],
+                "description": f"покупка {i}",
+                "timestamp": format_timestamp(first_moment + i * 30),
+            })
+        store.write(store.snapshot())
+        store.close()
+        print(f"Заполнение {count} расходов: {time.perf_counter() - start:.1f} с")
+
+        json_file = os.path.join(tmp_dir, "expenses.json")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump([
+                {
+                    "amount": (i * 7919) % 100000 / 100,
+                    "category": categories[i % len(categories)],
+                    "description": f"покупка {i}",
+                    "timestamp": format_timestamp(first_moment + i * 30),
+                }
+                for i in range(json_count)
+            ], f, indent=4, ensure_ascii=False)
+
+        print(f"{'Формат':<10} {'Расходов':>10} {'На диске, МБ':>14} {'Загрузка, с':>12} {'RSS, МБ':>12}")
+        for name, path in (("columns", directory), ("json", json_file)):
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            else:
+                size = os.path.getsize(path)
+            results = context.Queue()
+            process = context.Process(target=_measure_load, args=(path, results))
+            process.start()
+            rows, elapsed, rss = results.get()
+            process.join()
+            print(f"{name:<10} {rows:>10} {size / 1024 / 1024:>14.1f} {elapsed:>12.3f} {rss:>12.1f}")
+
+
+BENCHMARKS = {
+    "load": benchmark_load,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench":
+        BENCHMARKS[sys.argv[2]](*(int(arg) for arg in sys.argv[3:]))
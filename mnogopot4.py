@@ -1,15 +1,37 @@
 import threading
 import json
+import os
 import time
 from datetime import datetime
 
-class ExpenseManager:
-    def __init__(self, filename="expenses.json"):
+from expense_store import ExpenseQueries, open_store
+
+class ExpenseManager(ExpenseQueries):
+    def __init__(self, filename="expenses.json", save_interval=1.0, batch_size=100):
         self.filename = filename
+        # Расходы хранятся в колоночном виде в каталоге рядом с прежним JSON-файлом
+        self.store_dir = os.path.splitext(filename)[0] + ".store"
+        self.save_interval = save_interval
+        self.batch_size = batch_size
         self.expenses = self.load_expenses()
         self.lock = threading.Lock()
+        # Один фоновый писатель: изменения копятся и сохраняются не чаще раза
+        # в save_interval секунд или когда набралось batch_size новых расходов
+        self._changed = threading.Condition(self.lock)
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        self._flush_requested = False
+        self._closing = False
+        self._last_error = None
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
 
     def load_expenses(self):
+        # При первом запуске после перехода с JSON расходы переносятся в хранилище
+        return open_store(self.store_dir, self._load_legacy, self._report)
+
+    def _load_legacy(self):
         try:
             with open(self.filename, 'r') as f:
                 return json.load(f)
@@ -19,11 +41,75 @@ class ExpenseManager:
             print("Ошибка: файл расходов поврежден. Начинаем с чистого листа.")
             return []
 
+    def _report(self, level, message):
+        prefixes = {"ERROR": "Ошибка: ", "WARNING": "Предупреждение: "}
+        print(prefixes.get(level, "") + message)
+
     def save_expenses(self):
-        with self.lock: 
-            with open(self.filename, 'w') as f:
-                json.dump(self.expenses, f, indent=4)
-                print(f"Расходы сохранены в файл: {self.filename}")
+        self._save()
+
+    def _save(self):
+        # Снимок и запись под одним _save_lock, чтобы снимки попадали на диск по порядку;
+        # под self.lock только копирование новых строк, запись идёт без него
+        with self._save_lock:
+            with self.lock:
+                snapshot = self.expenses.snapshot()
+                version = self._version
+            self.expenses.write(snapshot)
+            print(f"Расходы сохранены в: {self.store_dir}")
+        return version
+
+    def _writer_loop(self):
+        while True:
+            with self._changed:
+                while self._version == self._saved_version and not self._closing:
+                    self._changed.wait()
+                if self._version == self._saved_version:
+                    return
+                deadline = time.monotonic() + self.save_interval
+                while (not self._flush_requested and not self._closing
+                       and self._version - self._saved_version < self.batch_size):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                self._flush_requested = False
+            try:
+                version = self._save()
+            except OSError as e:
+                print(f"Ошибка сохранения расходов: {e}")
+                with self._changed:
+                    self._last_error = e
+                    self._changed.notify_all()
+                    if self._closing:
+                        return
+                continue
+            with self._changed:
+                self._saved_version = max(self._saved_version, version)
+                self._changed.notify_all()
+
+    def flush(self):
+        """Немедленно сохраняет все добавленные расходы и ждёт записи на диск."""
+        with self._changed:
+            target = self._version
+            self._last_error = None
+            self._flush_requested = True
+            self._changed.notify_all()
+            while self._saved_version < target:
+                if self._last_error is not None:
+                    raise self._last_error
+                self._changed.wait()
+
+    def close(self):
+        """Сохраняет несохранённое и останавливает фонового писателя."""
+        try:
+            self.flush()
+        finally:
+            with self._changed:
+                self._closing = True
+                self._changed.notify_all()
+            self._writer.join()
+            self.expenses.close()
 
     def add_expense(self, amount, category, description=""):
         with self.lock:
@@ -35,31 +121,21 @@ class ExpenseManager:
                 "timestamp": timestamp
             })
             print(f"Добавлен расход: {amount} ({category}) - {description}")
-            threading.Thread(target=self.save_expenses).start()
+            self._version += 1
+            self._changed.notify()
 
     def generate_report(self):
-        report = {}
-        for expense in self.expenses:
-            category = expense["category"]
-            amount = expense["amount"]
-            if category in report:
-                report[category] += amount
-            else:
-                report[category] = amount
-
-        print("\n--- Отчет по расходам ---")
-        total_spending = 0
-        for category, total in report.items():
-            print(f"{category}: {total}")
-            total_spending += total
-        print(f"----\nВсего потрачено: {total_spending}")
+        self._print_report()
+
+    def generate_period_report(self, start_date, end_date, by="day"):
+        self._print_period_report(start_date, end_date, by)
+
+    def display_query(self, start=None, end=None, category=None, page_size=20):
+        """Выводит найденные расходы страницами, не загружая весь результат."""
+        self._print_query(start, end, category, page_size)
 
     def display_expenses(self):
-        print("\n--- Список расходов ---")
-        for i, expense in enumerate(self.expenses):
-            print(f"{i+1}. {expense['timestamp']} - {expense['amount']} ({expense['category']}) - {expense['description']}")
-        if not self.expenses:
-            print("Расходы отсутствуют.")
+        self._print_expenses()
 
 def main():
     expense_manager = ExpenseManager()
@@ -69,7 +145,9 @@ def main():
         print("1. Добавить расход")
         print("2. Показать расходы")
         print("3. Сгенерировать отчет")
-        print("4. Выход")
+        print("4. Отчет за период")
+        print("5. Поиск расходов")
+        print("6. Выход")
 
         choice = input("Выберите действие: ")
 
@@ -86,6 +164,28 @@ def main():
         elif choice == '3':
             expense_manager.generate_report()
         elif choice == '4':
+            try:
+                start_date = datetime.strptime(input("Начало периода (ГГГГ-ММ-ДД): "), "%Y-%m-%d").strftime("%Y-%m-%d")
+                end_date = datetime.strptime(input("Конец периода (ГГГГ-ММ-ДД): "), "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                print("Ошибка: Некорректный формат даты.")
+                continue
+            by = "month" if input("Группировать по месяцам? (д/н): ").strip().lower() == "д" else "day"
+            expense_manager.generate_period_report(start_date, end_date, by)
+        elif choice == '5':
+            try:
+                start = input("С (ГГГГ-ММ-ДД [ЧЧ:ММ:СС], пусто — с начала): ").strip() or None
+                end = input("По (ГГГГ-ММ-ДД [ЧЧ:ММ:СС], пусто — до конца): ").strip() or None
+                for value in (start, end):
+                    if value:
+                        datetime.strptime(value, "%Y-%m-%d %H:%M:%S" if len(value) > 10 else "%Y-%m-%d")
+            except ValueError:
+                print("Ошибка: Некорректный формат даты.")
+                continue
+            category = input("Категория (пусто — все): ").strip() or None
+            expense_manager.display_query(start, end, category)
+        elif choice == '6':
+            expense_manager.close()
             print("Выход из программы.")
             break
         else:
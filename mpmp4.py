@@ -1,10 +1,11 @@
 import threading
 import json
-import os
 from datetime import datetime
 import hashlib
 import time
 
+from expense_store import ExpenseQueries, open_store
+
 class Logger:
     def __init__(self, username):
         self.username = username
@@ -80,89 +81,182 @@ class UserManager:
         return False
 
 
-class ExpenseManager:
-    def __init__(self, username, logger):
+class ExpenseManager(ExpenseQueries):
+    """Расходы пользователя в колоночном хранилище {username}_expenses.store.
+
+    Новые расходы дописываются в конец столбцов хранилища (см. expense_store);
+    прежние {username}_expenses.json и журнал к нему переносятся в хранилище
+    при первом запуске. Автосохранение пишет только когда есть несохранённые расходы: интервал
+    растёт до max_interval, пока изменений нет, и сокращается до
+    min_interval, если за интервал накапливается pending_limit расходов.
+    """
+
+    def __init__(self, username, logger, autosave_interval=5.0, min_interval=0.5, max_interval=60.0,
+                 pending_limit=100):
         self.username = username
         self.filename = f"{username}_expenses.json"
-        self.expenses = self.load_expenses()
+        self.journal_filename = self.filename + ".journal"
+        self.store_dir = f"{username}_expenses.store"
+        self.logger = logger
+        self.autosave_interval = autosave_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.pending_limit = pending_limit
         self.lock = threading.Lock()
+        # Запись на диск идёт без self.lock, поэтому add_expense не ждёт сохранения
+        self.io_lock = threading.Lock()
+        self.expenses = self.load_expenses()
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._backed_off = False
         self.save_thread = None
         self.running = True
-        self.logger = logger
         self.start_autosave()
 
     def load_expenses(self):
+        # При первом запуске после перехода с JSON расходы переносятся в хранилище
+        return open_store(self.store_dir, self._load_legacy, self.logger.log)
+
+    def _load_legacy(self):
+        """Расходы из прежнего JSON-файла и журнала к нему."""
         try:
             with open(self.filename, 'r') as f:
-                return json.load(f)
+                expenses = json.load(f)
         except FileNotFoundError:
-            return []
+            expenses = []
         except json.JSONDecodeError:
             self.logger.log("ERROR", "Файл расходов поврежден. Начинаем с чистого листа.")
-            return []
+            expenses = []
+        try:
+            with open(self.journal_filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        seq, expense = json.loads(line)
+                    except (ValueError, TypeError):
+                        # Оборванная последняя строка после сбоя
+                        self.logger.log("ERROR", "Журнал расходов обрывается, хвост пропущен.")
+                        break
+                    # Записи, уже попавшие в основной файл при сжатии, пропускаем
+                    if seq == len(expenses):
+                        expenses.append(expense)
+                    elif seq > len(expenses):
+                        self.logger.log("ERROR", "В журнале расходов пропуск записей, хвост пропущен.")
+                        break
+        except FileNotFoundError:
+            pass
+        return expenses
 
-    def save_expenses(self):
+    def _write_pending(self, force=False):
+        """Дописывает несохранённые расходы в хранилище; вызывается под io_lock."""
         with self.lock:
-            with open(self.filename, 'w') as f:
-                json.dump(self.expenses, f, indent=4)
-            self.logger.log("INFO", f"Расходы сохранены в файл: {self.filename}")
+            pending, self._pending = self._pending, 0
+            if not pending and not force:
+                return 0
+            snapshot = self.expenses.snapshot()
+        try:
+            self.expenses.write(snapshot)
+        except OSError:
+            with self.lock:
+                self._pending += pending
+            raise
+        self.logger.log("INFO", f"Сохранено {pending} расходов в: {self.store_dir}")
+        return pending
+
+    def flush(self):
+        """Сохраняет несохранённые расходы; возвращает их количество."""
+        with self.io_lock:
+            return self._write_pending()
+
+    def save_expenses(self):
+        with self.io_lock:
+            self._write_pending(force=True)
 
     def start_autosave(self):
         def autosave():
+            interval = self.autosave_interval
             while self.running:
-                time.sleep(5)  
-                self.save_expenses()
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                if not self.running:
+                    break
+                with self.lock:
+                    pending = self._pending
+                if pending == 0:
+                    # Изменений нет — просыпаемся всё реже
+                    interval = min(self.max_interval, interval * 2)
+                    self._backed_off = interval > self.autosave_interval
+                    continue
+                if self._backed_off:
+                    # Первое изменение после простоя: даём накопиться остальным
+                    self._backed_off = False
+                    interval = self.autosave_interval
+                    continue
+                try:
+                    saved = self.flush()
+                except OSError as e:
+                    self.logger.log("ERROR", f"Ошибка автосохранения: {str(e)}")
+                    continue
+                if saved >= self.pending_limit:
+                    interval = max(self.min_interval, interval / 2)
+                else:
+                    interval = self.autosave_interval
         self.save_thread = threading.Thread(target=autosave, daemon=True)
         self.save_thread.start()
 
     def stop_autosave(self):
         self.running = False
+        self._wakeup.set()
         if self.save_thread:
             self.save_thread.join()
+        try:
+            self.flush()
+        finally:
+            self.expenses.close()
 
     def add_expense(self, amount, category, description=""):
         try:
             with self.lock:
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.expenses.append({
+                expense = {
                     "amount": amount,
                     "category": category,
                     "description": description,
                     "timestamp": timestamp
-                })
+                }
+                self.expenses.append(expense)
+                self._pending += 1
+                if self._pending >= self.pending_limit or (self._backed_off and self._pending == 1):
+                    self._wakeup.set()
                 self.logger.log("INFO", f"Добавлен расход: {amount} ({category}) - {description}")
         except Exception as e:
             self.logger.log("ERROR", f"Ошибка при добавлении расхода: {str(e)}")
 
     def obc_report(self):
         try:
-            report = {}
-            for expense in self.expenses:
-                category = expense["category"]
-                amount = expense["amount"]
-                if category in report:
-                    report[category] += amount
-                else:
-                    report[category] = amount
-
             self.logger.log("INFO", "Итоги отчет по расходам.")
-            print("\n--- Отчет по расходам ---")
-            total_spending = 0
-            for category, total in report.items():
-                print(f"{category}: {total}")
-                total_spending += total
-            print(f"----\nВсего потрачено: {total_spending}")
+            self._print_report()
         except Exception as e:
             self.logger.log("ERROR", f"Ошибка при генерации отчета: {str(e)}")
 
+    def period_report(self, start_date, end_date, by="day"):
+        try:
+            self.logger.log("INFO", f"Итоги расходов за период {start_date} — {end_date}.")
+            self._print_period_report(start_date, end_date, by)
+        except Exception as e:
+            self.logger.log("ERROR", f"Ошибка при генерации отчета за период: {str(e)}")
+
+    def display_query(self, start=None, end=None, category=None, page_size=20):
+        """Выводит найденные расходы страницами, не загружая весь результат."""
+        try:
+            total = self._print_query(start, end, category, page_size)
+            self.logger.log("INFO", f"Поиск расходов: {start} — {end}, категория {category}, найдено {total}.")
+        except Exception as e:
+            self.logger.log("ERROR", f"Ошибка при поиске расходов: {str(e)}")
+
     def display_expenses(self):
         try:
             self.logger.log("INFO", "Просмотр списка расходов.")
-            print("\n--- Список расходов ---")
-            for i, expense in enumerate(self.expenses):
-                print(f"{i+1}. {expense['timestamp']} - {expense['amount']} ({expense['category']}) - {expense['description']}")
-            if not self.expenses:
-                print("Расходы отсутствуют.")
+            self._print_expenses()
         except Exception as e:
             self.logger.log("ERROR", f"Ошибка при отображении расходов: {str(e)}")
 
@@ -205,7 +299,9 @@ def user_menu(expense_manager, logger):
         print("1. Добавить расход")
         print("2. Показать расходы")
         print("3. Итоги расходов")
-        print("4. Выход")
+        print("4. Итоги за период")
+        print("5. Поиск расходов")
+        print("6. Выход")
 
         choice = input("Выберите действие: ")
 
@@ -223,6 +319,29 @@ def user_menu(expense_manager, logger):
         elif choice == '3':
             expense_manager.obc_report()
         elif choice == '4':
+            try:
+                start_date = datetime.strptime(input("Начало периода (ГГГГ-ММ-ДД): "), "%Y-%m-%d").strftime("%Y-%m-%d")
+                end_date = datetime.strptime(input("Конец периода (ГГГГ-ММ-ДД): "), "%Y-%m-%d").strftime("%Y-%m-%d")
+            except ValueError:
+                logger.log("ERROR", "Некорректный формат даты.")
+                print("Ошибка: Некорректный формат даты.")
+                continue
+            by = "month" if input("Группировать по месяцам? (д/н): ").strip().lower() == "д" else "day"
+            expense_manager.period_report(start_date, end_date, by)
+        elif choice == '5':
+            try:
+                start = input("С (ГГГГ-ММ-ДД [ЧЧ:ММ:СС], пусто — с начала): ").strip() or None
+                end = input("По (ГГГГ-ММ-ДД [ЧЧ:ММ:СС], пусто — до конца): ").strip() or None
+                for value in (start, end):
+                    if value:
+                        datetime.strptime(value, "%Y-%m-%d %H:%M:%S" if len(value) > 10 else "%Y-%m-%d")
+            except ValueError:
+                logger.log("ERROR", "Некорректный формат даты.")
+                print("Ошибка: Некорректный формат даты.")
+                continue
+            category = input("Категория (пусто — все): ").strip() or None
+            expense_manager.display_query(start, end, category)
+        elif choice == '6':
             expense_manager.stop_autosave()
             logger.log("INFO", "Пользователь вышел из системы.")
             print("Выход из меню пользователя.")
@@ -1,70 +1,1251 @@
+import array
+import ast
+import collections
+import concurrent.futures
+import itertools
+import math
+import mmap
 import random
+import sys
+import tempfile
 import multiprocessing
 import threading
 import time
 import os
 import psutil
+import queue
+import struct
+import zlib
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from operator import mul
+
+try:
+    import numpy as np
+except ImportError:  # Без numpy доступен только эталонный движок на чистом Python
+    np = None
+
+class CpuSampler:
+    """Фоновый замер загрузки CPU со сглаживанием.
+
+    Поток раз в period секунд берёт неблокирующий замер psutil и обновляет
+    экспоненциальное среднее, поэтому load() отвечает мгновенно и не зависит
+    от одного случайного замера.
+    """
+
+    def __init__(self, period=0.5, alpha=0.3, history=120):
+        self.period = period
+        self.alpha = alpha
+        self.history = collections.deque(maxlen=history)
+        self._smoothed = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        # Первый вызов с interval=None только задаёт точку отсчёта
+        psutil.cpu_percent(interval=None)
+        time.sleep(0.1)
+        self._add(psutil.cpu_percent(interval=None))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _add(self, sample):
+        with self._lock:
+            self.history.append(sample)
+            if self._smoothed is None:
+                self._smoothed = sample
+            else:
+                self._smoothed += self.alpha * (sample - self._smoothed)
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self._add(psutil.cpu_percent(interval=None))
+
+    def load(self):
+        """Сглаженная загрузка CPU в процентах."""
+        with self._lock:
+            return self._smoothed
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+_cpu_sampler = None
+_cpu_sampler_lock = threading.Lock()
+
+def get_cpu_sampler():
+    """Общий для модуля сэмплер, запускается при первом обращении."""
+    global _cpu_sampler
+    with _cpu_sampler_lock:
+        if _cpu_sampler is None:
+            _cpu_sampler = CpuSampler().start()
+        return _cpu_sampler
 
 def get_cpu_load():
-    return psutil.cpu_percent(interval=1)
+    return get_cpu_sampler().load()
 
-def get_available_processes():
+def get_available_processes(own_processes=0):
+    """Сколько процессов можно занять при текущей загрузке.
+
+    own_processes — наши уже работающие процессы: их вклад в загрузку
+    вычитается, чтобы пул не сжимался из-за собственной работы.
+    """
     cpu_load = get_cpu_load()
     logical_cores = os.cpu_count()
-    available_cores = max(1, logical_cores - int(logical_cores * cpu_load / 100))
+    busy_cores = max(0.0, logical_cores * cpu_load / 100 - own_processes)
+    available_cores = max(1, logical_cores - int(busy_cores))
     return available_cores
 
+# Очередь логов ограничена: при переполнении сообщения отбрасываются, а не тормозят вычисления
+LOG_QUEUE_SIZE = 10000
+MAX_LOG_ENTRY = 4096
+LOG_FLUSH_BYTES = 64 * 1024
+LOG_FLUSH_INTERVAL = 0.5
+_dropped_logs = 0
+dropped_logs_total = 0
+
 def log_message(message, log_queue=None):
+    global _dropped_logs, dropped_logs_total
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if len(message) > MAX_LOG_ENTRY:
+        message = f"{message[:MAX_LOG_ENTRY]}... [truncated {len(message) - MAX_LOG_ENTRY} chars]"
     log_entry = f"[{timestamp}] {message}"
     
     if log_queue:
-        log_queue.put(log_entry)
+        if _dropped_logs:
+            log_entry += f" (dropped {_dropped_logs} earlier messages)"
+        try:
+            log_queue.put_nowait(log_entry)
+            _dropped_logs = 0
+        except queue.Full:
+            _dropped_logs += 1
+            dropped_logs_total += 1
     else:
         print(log_entry)
 
-def generate_matrix(rows, cols):
-    return [[random.randint(1, 100) for _ in range(cols)] for _ in range(rows)]
+def describe_matrix(matrix, limit=400):
+    """Матрица для лога: целиком, если она маленькая, иначе краткая сводка."""
+    rows = len(matrix)
+    cols = len(matrix[0]) if rows else 0
+    if rows * cols <= limit:
+        return str([list(row) for row in matrix])
+    if np is not None and isinstance(matrix, (np.ndarray, FlatMatrix)):
+        values = _as_array(matrix)
+        low, high = int(values.min()), int(values.max())
+    else:
+        low = min(min(row) for row in matrix)
+        high = max(max(row) for row in matrix)
+    return f"<{rows}x{cols} matrix, min {low}, max {high}, first row {list(matrix[0][:8])}...>"
+
+class FlatMatrix:
+    """Матрица int64 поверх плоского буфера, строки доступны как matrix[i][j].
+
+    Движки работают с ней так же, как со списком списков. Между процессами
+    передаётся только descriptor(), а подключение выполняет attach_matrix().
+    """
+
+    def __init__(self, buffer, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self._buffer = buffer[:rows * cols * 8]
+        self._flat = self._buffer.cast("q")
+        self._abs_max = None
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.rows:
+            raise IndexError(i)
+        return self._flat[i * self.cols:(i + 1) * self.cols]
+
+    def __iter__(self):
+        return (self[i] for i in range(self.rows))
+
+    def to_numpy(self):
+        return np.ndarray((self.rows, self.cols), dtype=np.int64, buffer=self._buffer)
+
+    def abs_max(self):
+        """Наибольший модуль элемента; считается один раз полосами строк размером с L2."""
+        if self._abs_max is None:
+            data = self.to_numpy()
+            band = max(1, cache_size() // (8 * max(1, self.cols)))
+            self._abs_max = max(
+                (int(np.abs(data[i:i + band]).max()) for i in range(0, self.rows, band) if self.cols),
+                default=0,
+            )
+        return self._abs_max
+
+    def write_block(self, start_row, start_col, block):
+        if np is not None and isinstance(block, np.ndarray):
+            self.to_numpy()[start_row:start_row + block.shape[0], start_col:start_col + block.shape[1]] = block
+            return
+        for i, row in enumerate(block, start_row):
+            self[i][start_col:start_col + len(row)] = array.array("q", row)
+
+    def add_block(self, start_row, start_col, block):
+        """Прибавляет блок к уже записанным значениям (редукция по k)."""
+        if np is not None and isinstance(block, np.ndarray):
+            self.to_numpy()[start_row:start_row + block.shape[0], start_col:start_col + block.shape[1]] += block
+            return
+        for i, row in enumerate(block, start_row):
+            target = self[i]
+            for j, value in enumerate(row, start_col):
+                target[j] += value
+
+    def close(self):
+        self._flat.release()
+        self._buffer.release()
+
+class SharedMatrix(FlatMatrix):
+    """Матрица в общей памяти: процессы читают и пишут её без копирования."""
 
-def save_partial_result(result_part, filename_prefix, process_id, thread_id, log_queue):
+    def __init__(self, shm, rows, cols):
+        self.shm = shm
+        super().__init__(shm.buf, rows, cols)
+
+    @classmethod
+    def create(cls, rows, cols):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, rows * cols * 8))
+        return cls(shm, rows, cols)
+
+    @classmethod
+    def from_rows(cls, matrix):
+        shared = cls.create(len(matrix), len(matrix[0]) if len(matrix) else 0)
+        shared.write_block(0, 0, matrix)
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor):
+        name, rows, cols = descriptor
+        return cls(shared_memory.SharedMemory(name=name), rows, cols)
+
+    def descriptor(self):
+        return (self.shm.name, self.rows, self.cols)
+
+    def close(self):
+        super().close()
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
+_NPY_MAGIC = b"\x93NUMPY"
+
+def _npy_header(rows, cols):
+    """Заголовок .npy версии 1.0 для C-матрицы '<i8', выровненный на 64 байта."""
+    header = repr({"descr": "<i8", "fortran_order": False, "shape": (rows, cols)}).encode("latin1")
+    padding = 64 - (len(_NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header += b" " * (padding % 64) + b"\n"
+    return _NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)) + header
+
+def _read_npy_header(f):
+    """Возвращает (rows, cols, смещение данных) для файла .npy с int64."""
+    if f.read(6) != _NPY_MAGIC:
+        raise ValueError(f"{f.name}: не файл .npy")
+    major = f.read(2)[0]
+    length = struct.unpack("<H" if major == 1 else "<I", f.read(2 if major == 1 else 4))[0]
+    header = ast.literal_eval(f.read(length).decode("latin1"))
+    shape = tuple(header["shape"])
+    if header["descr"] not in ("<i8", "|i8") or header["fortran_order"] or len(shape) != 2:
+        raise ValueError(f"{f.name}: ожидается двумерная матрица int64 в порядке C")
+    return shape[0], shape[1], f.tell()
+
+class MappedMatrix(FlatMatrix):
+    """Матрица из файла .npy, отображённого в память через mmap.
+
+    Страницы подгружаются по мере обращения, поэтому файл может быть больше
+    оперативной памяти; процессы отображают один и тот же файл независимо.
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.writable = writable
+        self._file = open(path, "r+b" if writable else "rb")
+        rows, cols, offset = _read_npy_header(self._file)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        if len(self._map) < offset + rows * cols * 8:
+            self._map.close()
+            self._file.close()
+            raise ValueError(f"{path}: файл короче, чем указано в заголовке")
+        view = memoryview(self._map)
+        super().__init__(view[offset:], rows, cols)
+        view.release()
+
+    @classmethod
+    def open(cls, path, writable=False):
+        return cls(path, writable)
+
+    @classmethod
+    def create(cls, path, rows, cols):
+        """Создаёт файл .npy нужного размера и открывает его на запись."""
+        header = _npy_header(rows, cols)
+        with open(path, "wb") as f:
+            f.write(header)
+            f.truncate(len(header) + rows * cols * 8)
+        return cls(path, writable=True)
+
+    def descriptor(self):
+        return ("npy", self.path, self.writable)
+
+    def close(self):
+        super().close()
+        if self.writable:
+            self._map.flush()
+        self._map.close()
+        self._file.close()
+
+def attach_matrix(descriptor):
+    """Подключает матрицу по descriptor() в другом процессе."""
+    if descriptor[0] == "npy":
+        return MappedMatrix.open(descriptor[1], descriptor[2])
+    return SharedMatrix.attach(descriptor)
+
+def save_npy(path, matrix):
+    """Пишет матрицу (список строк, ndarray или FlatMatrix) в .npy построчно."""
+    rows = len(matrix)
+    cols = len(matrix[0]) if rows else 0
+    with open(path + ".tmp", "wb") as f:
+        f.write(_npy_header(rows, cols))
+        if np is not None and isinstance(matrix, np.ndarray):
+            f.write(matrix.astype("<i8").tobytes())
+        else:
+            for row in matrix:
+                f.write(row.tobytes() if isinstance(row, memoryview) else array.array("q", row).tobytes())
+    os.replace(path + ".tmp", path)
+
+def export_text(path, matrix):
+    """Необязательный экспорт матрицы в текст: строки через пробел."""
+    with open(path, "w") as f:
+        for row in matrix:
+            f.write(' '.join(map(str, row)) + '\n')
+
+def split_rows(total_rows, num_processes):
+    """Делит строки на полосы; остаток строк достаётся последнему процессу."""
+    rows_per_process = total_rows // num_processes
+    extra_rows = total_rows % num_processes
+    bands = []
+    for i in range(num_processes):
+        start_row = i * rows_per_process
+        end_row = start_row + rows_per_process
+        if i == num_processes - 1:
+            end_row += extra_rows
+        bands.append((start_row, end_row))
+    return bands
+
+def cache_size(level=2, default=256 * 1024):
+    """Размер кэша данных указанного уровня в байтах (Linux sysfs), иначе default."""
+    base = "/sys/devices/system/cpu/cpu0/cache"
     try:
-        filename = f"{filename_prefix}_proc{process_id}_thread{thread_id}.txt"
-        with open(filename, 'w') as f:
-            for row in result_part:
-                f.write(' '.join(map(str, row)) + '\n')
-        log_message(f"Process {process_id}, thread {thread_id} saved partial result to {filename}", log_queue)
-    except Exception as e:
-        log_message(f"Error saving partial result: {str(e)}", log_queue)
+        for index in sorted(os.listdir(base)):
+            path = os.path.join(base, index)
+            with open(os.path.join(path, "level")) as f:
+                if int(f.read()) != level:
+                    continue
+            with open(os.path.join(path, "type")) as f:
+                if f.read().strip() == "Instruction":
+                    continue
+            with open(os.path.join(path, "size")) as f:
+                size = f.read().strip().upper()
+            units = {"K": 1024, "M": 1024 ** 2}
+            return int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+    except (OSError, ValueError):
+        pass
+    return default
 
-def multiply_partial(matrix_a, matrix_b, start_row, end_row, process_id, log_queue, result_queue):
-    result_part = []
-    saver_threads = []
-    
+def plan_tiles(rows, cols, inner, num_workers, tile_size=None):
+    """Делит C на плитки (i0, i1, j0, j1, k0, k1).
+
+    Сторона плитки подбирается так, чтобы блоки A, B и C помещались в L2.
+    Если плиток по строкам и столбцам слишком мало для всех процессов
+    (узкие или вытянутые матрицы), дополнительно делится измерение k,
+    а частичные суммы складываются в C.
+    """
+    if tile_size is None:
+        tile_size = max(16, math.isqrt(cache_size() // (3 * 8)))
+    tile_rows = min(rows, tile_size)
+    tile_cols = min(cols, tile_size)
+    # Для малых матриц мельчим плитки, чтобы каждому процессу досталось несколько
+    while (tile_rows > 1 or tile_cols > 1) and math.ceil(rows / tile_rows) * math.ceil(cols / tile_cols) < 4 * num_workers:
+        if tile_cols > 1 and tile_cols >= tile_rows:
+            tile_cols = (tile_cols + 1) // 2
+        else:
+            tile_rows = (tile_rows + 1) // 2
+    tile_k = inner
+    blocks = math.ceil(rows / tile_rows) * math.ceil(cols / tile_cols)
+    if blocks < 4 * num_workers and inner > tile_size:
+        tile_k = max(tile_size, math.ceil(inner / math.ceil(4 * num_workers / blocks)))
+    tiles = []
+    for i0 in range(0, rows, tile_rows):
+        for j0 in range(0, cols, tile_cols):
+            for k0 in range(0, inner, tile_k):
+                tiles.append((i0, min(i0 + tile_rows, rows), j0, min(j0 + tile_cols, cols), k0, min(k0 + tile_k, inner)))
+    return tiles
+
+# Генерация идёт блоками по GENERATE_BLOCK_ROWS строк; у каждого блока свой поток
+# случайных чисел от (seed, номер блока), поэтому результат не зависит от числа процессов
+GENERATE_BLOCK_ROWS = 256
+VALUE_RANGE = (1, 100)
+_VALUES = range(VALUE_RANGE[0], VALUE_RANGE[1] + 1)
+
+def _random_block(seed, block, rows, cols):
+    """Случайный блок rows x cols для потока (seed, block).
+
+    С numpy это ndarray из PCG64, без numpy — список строк из random.Random;
+    последовательности у двух вариантов разные, но каждая воспроизводима.
+    """
+    if np is not None:
+        rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(block,))))
+        return rng.integers(VALUE_RANGE[0], VALUE_RANGE[1] + 1, size=(rows, cols), dtype=np.int64)
+    values = random.Random(f"{seed}:{block}").choices(_VALUES, k=rows * cols)
+    return [values[i * cols:(i + 1) * cols] for i in range(rows)]
+
+def _fill_blocks(matrix, seed, blocks):
+    for block in blocks:
+        start_row = block * GENERATE_BLOCK_ROWS
+        rows = min(GENERATE_BLOCK_ROWS, matrix.rows - start_row)
+        matrix.write_block(start_row, 0, _random_block(seed, block, rows, matrix.cols))
+
+def generate_worker(descriptor, seed, blocks):
+    matrix = attach_matrix(descriptor)
+    try:
+        _fill_blocks(matrix, seed, blocks)
+    finally:
+        matrix.close()
+
+def generate_into(matrix, seed, workers=1):
+    """Заполняет SharedMatrix или записываемую MappedMatrix случайными числами.
+
+    Блоки раздаются процессам через шаг workers; при workers=1 всё
+    делается в текущем процессе.
+    """
+    blocks = range(math.ceil(matrix.rows / GENERATE_BLOCK_ROWS))
+    workers = max(1, min(workers, len(blocks)))
+    if workers == 1:
+        _fill_blocks(matrix, seed, blocks)
+        return matrix
+    processes = []
+    for i in range(workers):
+        p = multiprocessing.Process(target=generate_worker, args=(matrix.descriptor(), seed, blocks[i::workers]))
+        processes.append(p)
+        p.start()
+    for p in processes:
+        p.join()
+        if p.exitcode != 0:
+            raise RuntimeError(f"Процесс генерации завершился с кодом {p.exitcode}")
+    return matrix
+
+def generate_shared(rows, cols, seed, workers=1):
+    """Случайная матрица сразу в общей памяти."""
+    return generate_into(SharedMatrix.create(rows, cols), seed, workers)
+
+def generate_npy(path, rows, cols, seed, workers=1):
+    """Случайная матрица сразу в файл .npy через mmap."""
+    matrix = generate_into(MappedMatrix.create(path, rows, cols), seed, workers)
+    matrix.close()
+
+def generate_matrix(rows, cols, seed=None):
+    """Случайная матрица списком строк; при одном и том же seed она одна и та же."""
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    matrix = []
+    for block in range(math.ceil(rows / GENERATE_BLOCK_ROWS)):
+        count = min(GENERATE_BLOCK_ROWS, rows - block * GENERATE_BLOCK_ROWS)
+        part = _random_block(seed, block, count, cols)
+        matrix.extend(part.tolist() if np is not None and isinstance(part, np.ndarray) else part)
+    return matrix
+
+CHECKPOINT_DIR = "checkpoint"
+
+# Запись индекса: первая строка блока, строка после последней, смещение в .bin, crc32
+_INDEX_RECORD = struct.Struct("<qqqI")
+_INPUTS_HEADER = struct.Struct("<qqq")
+
+def _rows_to_bytes(rows):
+    if np is not None and isinstance(rows, np.ndarray):
+        return rows.astype("<i8").tobytes()
+    return array.array("q", itertools.chain.from_iterable(rows)).tobytes()
+
+def _rows_from_bytes(data, cols):
+    flat = array.array("q")
+    flat.frombytes(data)
+    return [flat[i:i + cols].tolist() for i in range(0, len(flat), cols)]
+
+class CheckpointWriter:
+    """Дописывает готовые блоки строк в part<N>.bin и индекс part<N>.idx.
+
+    Запись идёт в отдельном потоке через ограниченную очередь: submit()
+    никогда не ждёт диска, а при переполненной очереди блок пропускается
+    и просто будет пересчитан при возобновлении. Данные пишутся раньше
+    записи индекса, а fsync выполняется не чаще раза в fsync_interval.
+    """
+
+    def __init__(self, directory, part_id, max_pending=8, fsync_interval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self._data = open(os.path.join(directory, f"part{part_id}.bin"), "ab")
+        self._index = open(os.path.join(directory, f"part{part_id}.idx"), "ab")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, start_row, rows):
+        try:
+            self._queue.put_nowait((start_row, rows))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            start_row, rows = item
+            payload = _rows_to_bytes(rows)
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            self._data.write(payload)
+            self._data.flush()
+            now = time.monotonic()
+            if now - last_sync >= self.fsync_interval:
+                os.fsync(self._data.fileno())
+                last_sync = now
+            self._index.write(_INDEX_RECORD.pack(start_row, start_row + len(rows), offset, zlib.crc32(payload)))
+            self._index.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for f in (self._data, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+def save_checkpoint_inputs(directory, matrix_a, matrix_b):
+    """Начинает новую контрольную точку: удаляет старую и сохраняет A и B."""
+    clear_checkpoint(directory)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "inputs.bin")
+    with open(path + ".tmp", "wb") as f:
+        f.write(_INPUTS_HEADER.pack(len(matrix_a), len(matrix_b), len(matrix_b[0])))
+        f.write(_rows_to_bytes(matrix_a))
+        f.write(_rows_to_bytes(matrix_b))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def load_checkpoint_inputs(directory):
+    """Возвращает (A, B) незавершённой задачи или None."""
+    try:
+        with open(os.path.join(directory, "inputs.bin"), "rb") as f:
+            a_rows, a_cols, b_cols = _INPUTS_HEADER.unpack(f.read(_INPUTS_HEADER.size))
+            matrix_a = _rows_from_bytes(f.read(a_rows * a_cols * 8), a_cols)
+            matrix_b = _rows_from_bytes(f.read(a_cols * b_cols * 8), b_cols)
+    except (OSError, struct.error):
+        return None
+    if len(matrix_a) != a_rows or len(matrix_b) != a_cols:
+        return None
+    return matrix_a, matrix_b
+
+def load_checkpoint_blocks(directory, cols):
+    """Читает все целые блоки строк из part*.bin; повреждённые хвосты пропускаются."""
+    blocks = []
+    if not os.path.isdir(directory):
+        return blocks
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("part") and name.endswith(".idx")):
+            continue
+        data_path = os.path.join(directory, name[:-4] + ".bin")
+        with open(os.path.join(directory, name), "rb") as f:
+            index = f.read()
+        with open(data_path, "rb") as data:
+            for pos in range(0, len(index) - _INDEX_RECORD.size + 1, _INDEX_RECORD.size):
+                start_row, end_row, offset, crc = _INDEX_RECORD.unpack_from(index, pos)
+                data.seek(offset)
+                payload = data.read((end_row - start_row) * cols * 8)
+                if len(payload) != (end_row - start_row) * cols * 8 or zlib.crc32(payload) != crc:
+                    continue
+                blocks.append((start_row, end_row, _rows_from_bytes(payload, cols)))
+    return blocks
+
+def clear_checkpoint(directory):
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+def missing_ranges(total_rows, blocks):
+    """Диапазоны строк, которых нет среди готовых блоков."""
+    covered = sorted((start_row, end_row) for start_row, end_row, _ in blocks)
+    ranges = []
+    position = 0
+    for start_row, end_row in covered:
+        if start_row > position:
+            ranges.append((position, start_row))
+        position = max(position, end_row)
+    if position < total_rows:
+        ranges.append((position, total_rows))
+    return ranges
+
+def split_ranges(ranges, num_processes):
+    """Делит диапазоны строк между процессами поровну по числу строк."""
+    total = sum(end_row - start_row for start_row, end_row in ranges)
+    share = max(1, math.ceil(total / num_processes))
+    assignments = [[]]
+    taken = 0
+    for start_row, end_row in ranges:
+        while start_row < end_row:
+            if taken == share:
+                assignments.append([])
+                taken = 0
+            end = min(end_row, start_row + share - taken)
+            assignments[-1].append((start_row, end))
+            taken += end - start_row
+            start_row = end
+    return [ranges for ranges in assignments if ranges]
+
+# math.sumprod (Python 3.12+) считает скалярное произведение целиком на C
+_dot = getattr(math, "sumprod", None) or (lambda x, y: sum(map(mul, x, y)))
+
+def transpose(matrix, start_col=0, end_col=None):
+    """Столбцы [start_col, end_col) матрицы в виде непрерывных кортежей."""
+    if start_col == 0 and end_col is None:
+        return list(zip(*matrix))
+    return list(zip(*(row[start_col:end_col] for row in matrix)))
+
+def multiply_tile_python(matrix_a, columns_b, tile):
+    """Плитка произведения на чистом Python; B передаётся транспонированной.
+
+    Строка A и столбец B лежат в памяти подряд, а внутренний цикл
+    выполняет скалярное произведение без индексирования на каждом шаге.
+    """
+    i0, i1, j0, j1, k0, k1 = tile
+    columns = [columns_b[j][k0:k1] for j in range(j0, j1)]
+    block = []
+    for i in range(i0, i1):
+        row_a = matrix_a[i][k0:k1]
+        block.append([_dot(row_a, column) for column in columns])
+    return block
+
+def multiply_rows_python(matrix_a, matrix_b, start_row, end_row):
+    """Движок на чистом Python: строки [start_row, end_row) произведения.
+
+    B транспонируется полосами столбцов размером с L2, поэтому в памяти
+    процесса одновременно лежит одна полоса, а не вся B целиком.
+    """
+    inner, cols = len(matrix_b), len(matrix_b[0])
+    band = max(16, cache_size() // (8 * max(1, inner)))
+    rows = [[] for _ in range(start_row, end_row)]
+    for j0 in range(0, cols, band):
+        j1 = min(j0 + band, cols)
+        block = multiply_tile_python(matrix_a, transpose(matrix_b, j0, j1), (start_row, end_row, 0, j1 - j0, 0, inner))
+        for row, part in zip(rows, block):
+            row.extend(part)
+    return rows
+
+def multiply_tile_reference(matrix_a, matrix_b, tile):
+    """Плитка произведения эталонным движком; B передаётся как есть."""
+    i0, i1, j0, j1, k0, k1 = tile
+    return [
+        [sum(matrix_a[i][k] * matrix_b[k][j] for k in range(k0, k1)) for j in range(j0, j1)]
+        for i in range(i0, i1)
+    ]
+
+def multiply_rows_reference(matrix_a, matrix_b, start_row, end_row):
+    """Эталонный движок: строки [start_row, end_row) произведения на чистом Python."""
+    rows = []
     for i in range(start_row, end_row):
         row_result = []
         for j in range(len(matrix_b[0])):
             element = sum(matrix_a[i][k] * matrix_b[k][j] for k in range(len(matrix_a[0])))
             row_result.append(element)
-        result_part.append(row_result)
-        
-        # Периодически сохраняем промежуточные результаты в потоках
-        if i % max(1, (end_row - start_row) // 5) == 0:  
-            thread_id = len(saver_threads)
-            t = threading.Thread(
-                target=save_partial_result,
-                args=(result_part, "partial_result", process_id, thread_id, log_queue)
-            )
-            t.daemon = True
-            t.start()
-            saver_threads.append(t)
+        rows.append(row_result)
+    return rows
+
+def _as_array(matrix):
+    if isinstance(matrix, FlatMatrix):
+        return matrix.to_numpy()
+    return np.asarray(matrix, dtype=np.int64)
+
+def _abs_max(matrix):
+    if isinstance(matrix, FlatMatrix):
+        return matrix.abs_max()
+    values = _as_array(matrix)
+    return int(np.abs(values).max()) if values.size else 0
+
+def _exact_in_float64(a, matrix_b):
+    """BLAS работает только с плавающей точкой; float64 точен, пока суммы меньше 2**53.
+
+    Граница для B берётся по всей матрице: у FlatMatrix она считается один раз
+    на задание, а не заново для каждой порции строк или плитки.
+    """
+    return int(np.abs(a).max()) * _abs_max(matrix_b) * a.shape[1] < 2 ** 53
+
+def multiply_tile_numpy(matrix_a, matrix_b, tile):
+    """Плитка произведения через numpy."""
+    i0, i1, j0, j1, k0, k1 = tile
+    a = _as_array(matrix_a)[i0:i1, k0:k1]
+    b = _as_array(matrix_b)[k0:k1, j0:j1]
+    if a.size == 0 or b.size == 0:
+        return np.zeros((a.shape[0], b.shape[1]), dtype=np.int64)
+    if _exact_in_float64(a, matrix_b):
+        return np.rint(a.astype(np.float64) @ b.astype(np.float64)).astype(np.int64)
+    return a @ b
+
+def multiply_rows_numpy(matrix_a, matrix_b, start_row, end_row):
+    """Векторизованный движок: умножение через numpy (BLAS для float64).
+
+    Как и в multiply_rows_python, B обрабатывается полосами столбцов:
+    во float64 переводится только текущая полоса, поэтому матрица B,
+    отображённая из файла, целиком в память процесса не копируется.
+    """
+    a = _as_array(matrix_a)[start_row:end_row]
+    b = _as_array(matrix_b)
+    result = np.zeros((a.shape[0], b.shape[1]), dtype=np.int64)
+    if a.size == 0 or b.size == 0:
+        return result
+    exact = _exact_in_float64(a, matrix_b)
+    if exact:
+        a = a.astype(np.float64)
+    # BLAS быстр только на широких панелях, поэтому полоса больше, чем у Python-движка,
+    # но её объём (16 L2) по-прежнему не зависит от размера B
+    band = max(16, 16 * cache_size() // (8 * b.shape[0]))
+    for j0 in range(0, b.shape[1], band):
+        part = b[:, j0:j0 + band]
+        if exact:
+            result[:, j0:j0 + band] = np.rint(a @ part.astype(np.float64))
+        else:
+            result[:, j0:j0 + band] = a @ part
+    return result
+
+ENGINES = {
+    "python": multiply_rows_python,
+    "numpy": multiply_rows_numpy,
+    "reference": multiply_rows_reference,
+}
+
+TILE_ENGINES = {
+    "python": multiply_tile_python,
+    "numpy": multiply_tile_numpy,
+    "reference": multiply_tile_reference,
+}
+
+def available_engines():
+    return [name for name in ENGINES if name != "numpy" or np is not None]
+
+def _chunks(ranges, parts=5):
+    """Разбивает назначенные строки на порции примерно по 1/parts."""
+    step = max(1, sum(end_row - start_row for start_row, end_row in ranges) // parts)
+    for start_row, end_row in ranges:
+        for chunk_start in range(start_row, end_row, step):
+            yield chunk_start, min(chunk_start + step, end_row)
+
+def multiply_partial(matrix_a, matrix_b, ranges, process_id, log_queue, result_queue, engine="python", checkpoint_dir=None):
+    multiply_rows = ENGINES[engine]
+    result_part = []
+    writer = CheckpointWriter(checkpoint_dir, process_id) if checkpoint_dir else None
+    try:
+        # Считаем порциями примерно по 20% и отдаём каждую готовую порцию в контрольную точку
+        for chunk_start, chunk_end in _chunks(ranges):
+            rows = multiply_rows(matrix_a, matrix_b, chunk_start, chunk_end)
+            rows = rows.tolist() if np is not None and isinstance(rows, np.ndarray) else rows
+            result_part.append((chunk_start, chunk_end, rows))
+            if writer is not None:
+                writer.submit(chunk_start, rows)
+    finally:
+        if writer is not None:
+            writer.close()
+            if writer.dropped:
+                log_message(f"Process {process_id} skipped {writer.dropped} checkpoint blocks", log_queue)
     
-    # завершения всех потоков сохранения
-    for t in saver_threads:
-        t.join()
+    result_queue.put(result_part)
+    log_message(f"Process {process_id} finished rows {ranges}", log_queue)
+
+def multiply_shared(descriptors, ranges, process_id, log_queue, done_queue, engine="python", checkpoint_dir=None):
+    """Считает назначенные строки, читая A и B из общей памяти или mmap и записывая C на место."""
+    matrix_a, matrix_b, matrix_c = (attach_matrix(d) for d in descriptors)
+    writer = CheckpointWriter(checkpoint_dir, process_id) if checkpoint_dir else None
+    try:
+        multiply_rows = ENGINES[engine]
+        for chunk_start, chunk_end in _chunks(ranges):
+            rows = multiply_rows(matrix_a, matrix_b, chunk_start, chunk_end)
+            matrix_c.write_block(chunk_start, 0, rows)
+            if writer is not None:
+                writer.submit(chunk_start, rows)
+            del rows
+    finally:
+        if writer is not None:
+            writer.close()
+        for matrix in (matrix_a, matrix_b, matrix_c):
+            matrix.close()
+    done_queue.put(ranges)
+    log_message(f"Process {process_id} finished rows {ranges}", log_queue)
+
+def _plan_resume(total_rows, num_processes, log_queue, checkpoint_dir, cols):
+    """Готовые блоки из контрольной точки и раздача оставшихся строк по процессам."""
+    blocks = load_checkpoint_blocks(checkpoint_dir, cols) if checkpoint_dir else []
+    if blocks:
+        restored = total_rows - sum(end_row - start_row for start_row, end_row in missing_ranges(total_rows, blocks))
+        log_message(f"Restored {restored} of {total_rows} rows from checkpoint", log_queue)
+    return blocks, split_ranges(missing_ranges(total_rows, blocks), num_processes)
+
+def run_shared(matrix_a, matrix_b, num_processes, engine, log_queue, checkpoint_dir=None):
+    """Умножает через общую память и возвращает SharedMatrix с результатом.
+
+    Вызывающий отвечает за unlink() результата. С checkpoint_dir готовые
+    строки прошлого запуска берутся из контрольной точки.
+    """
+    shared_a = SharedMatrix.from_rows(matrix_a)
+    shared_b = SharedMatrix.from_rows(matrix_b)
+    shared_c = SharedMatrix.create(shared_a.rows, shared_b.cols)
+    try:
+        _run_bands(shared_a, shared_b, shared_c, num_processes, engine, log_queue, checkpoint_dir)
+    except BaseException:
+        shared_c.unlink()
+        raise
+    finally:
+        shared_a.unlink()
+        shared_b.unlink()
+    return shared_c
+
+def run_mapped(path_a, path_b, path_c, num_processes, engine, log_queue):
+    """Умножает матрицы из файлов .npy и пишет результат в path_c.
+
+    Процессы сами отображают файлы в память, поэтому ни A и B, ни C
+    не копируются целиком ни в родителе, ни в процессах.
+    """
+    mapped_a = MappedMatrix.open(path_a)
+    mapped_b = MappedMatrix.open(path_b)
+    try:
+        if mapped_a.cols != mapped_b.rows:
+            raise ValueError("Количество столбцов A должно совпадать с количеством строк B")
+        mapped_c = MappedMatrix.create(path_c, mapped_a.rows, mapped_b.cols)
+        try:
+            _run_bands(mapped_a, mapped_b, mapped_c, num_processes, engine, log_queue)
+        finally:
+            mapped_c.close()
+    finally:
+        mapped_a.close()
+        mapped_b.close()
+
+def _run_bands(matrix_a, matrix_b, matrix_c, num_processes, engine, log_queue, checkpoint_dir=None):
+    """Раздаёт полосы строк процессам, которые пишут C на место по descriptor()."""
+    descriptors = (matrix_a.descriptor(), matrix_b.descriptor(), matrix_c.descriptor())
+    blocks, assignments = _plan_resume(matrix_a.rows, num_processes, log_queue, checkpoint_dir, matrix_b.cols)
+    for start_row, _, rows in blocks:
+        matrix_c.write_block(start_row, 0, rows)
+    done_queue = multiprocessing.Queue()
+    processes = []
+    for i, ranges in enumerate(assignments):
+        p = multiprocessing.Process(
+            target=multiply_shared,
+            args=(descriptors, ranges, i, log_queue, done_queue, engine, checkpoint_dir)
+        )
+        processes.append(p)
+        p.start()
+    for _ in processes:
+        done_queue.get()
+    for p in processes:
+        p.join()
+
+def pool_worker(task_queue, result_queue, reduce_lock, process_id, log_queue=None, active=None):
+    """Тёплый процесс пула: считает плитки любых заданий, пока не получит None.
+
+    Подключённые сегменты последних заданий кэшируются, чтобы не открывать
+    общую память и не транспонировать B заново для каждой плитки. Если пул
+    сократился (active стало не больше process_id), процесс выходит после
+    текущей плитки.
+    """
+    attached = {}
+    tiles_done = 0
+    try:
+        while active is None or process_id < active.value:
+            task = task_queue.get()
+            if task is None:
+                break
+            job_id, descriptors, tile, engine = task
+            try:
+                if job_id not in attached:
+                    if len(attached) >= 4:
+                        for matrix in attached.pop(next(iter(attached)))[:3]:
+                            matrix.close()
+                    matrix_a, matrix_b, matrix_c = (attach_matrix(d) for d in descriptors)
+                    operand_b = transpose(matrix_b) if engine == "python" else matrix_b
+                    attached[job_id] = (matrix_a, matrix_b, matrix_c, operand_b)
+                matrix_a, matrix_b, matrix_c, operand_b = attached[job_id]
+                i0, i1, j0, j1, k0, k1 = tile
+                block = TILE_ENGINES[engine](matrix_a, operand_b, tile)
+                if k0 == 0 and k1 == matrix_a.cols:
+                    matrix_c.write_block(i0, j0, block)
+                else:
+                    with reduce_lock:
+                        matrix_c.add_block(i0, j0, block)
+                del block
+                tiles_done += 1
+                result_queue.put((job_id, None))
+            except Exception as e:
+                result_queue.put((job_id, f"{type(e).__name__}: {e}"))
+    finally:
+        for matrices in attached.values():
+            for matrix in matrices[:3]:
+                matrix.close()
+    if log_queue is not None:
+        log_message(f"Pool worker {process_id} stopped after {tiles_done} tiles", log_queue)
+
+# Как часто сборщик результатов проверяет, не упал ли процесс пула
+POOL_WATCH_INTERVAL = 0.5
+
+class MatrixPool:
+    """Долгоживущий пул процессов для серий умножений.
+
+    Процессы запускаются один раз и переиспользуются всеми заданиями.
+    Задание разбивается на плитки (plan_tiles), которые процессы разбирают
+    из общей очереди; матрицы передаются через общую память. С autoscale=True
+    число работающих процессов (до workers) следует за загрузкой CPU.
+
+    Если процесс аварийно завершился (нехватка памяти, падение BLAS), его
+    плитки потеряны, а общие блокировки могли остаться захваченными: пул
+    становится сломанным, как ProcessPoolExecutor, — процессы останавливаются,
+    незавершённые задания получают BrokenProcessPool, их общая память
+    освобождается. Пример:
+
+        with MatrixPool(workers=4) as pool:
+            futures = pool.submit_batch([(a1, b1), (a2, b2)])
+            results = [f.result() for f in futures]
+    """
+
+    def __init__(self, workers=None, engine="python", tile_size=None, log_queue=None,
+                 autoscale=False, autoscale_interval=1.0):
+        if engine not in available_engines():
+            raise ValueError(f"Неизвестный движок: {engine}")
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.tile_size = tile_size
+        self.log_queue = log_queue
+        self._task_queue = multiprocessing.Queue()
+        self._result_queue = multiprocessing.Queue()
+        self._reduce_lock = multiprocessing.Lock()
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._next_job_id = 0
+        self._closed = False
+        self._broken = None  # Причина поломки пула, если процесс упал
+        self._workers_lock = threading.Lock()
+        self._processes = {}
+        self._active = multiprocessing.Value("i", 0)
+        # Трекер общей памяти должен появиться до запуска процессов, иначе каждый
+        # процесс заведёт свой и удалит сегменты чужих заданий при выходе
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+        self.resize(self.workers)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        if log_queue is not None:
+            log_message(f"Matrix pool started with {self.workers} workers, engine: {engine}", log_queue)
+        self._stop_autoscale = threading.Event()
+        self._autoscaler = None
+        if autoscale:
+            self._autoscaler = threading.Thread(target=self._autoscale, args=(autoscale_interval,), daemon=True)
+            self._autoscaler.start()
+
+    @property
+    def active_workers(self):
+        return self._active.value
+
+    def resize(self, workers):
+        """Меняет число работающих процессов (от 1 до workers пула).
+
+        Лишние процессы выходят после текущей плитки, недостающие запускаются.
+        """
+        # Упавший процесс нельзя просто перезапустить: его плитки уже потеряны
+        self._check_workers()
+        workers = max(1, min(self.workers, workers))
+        with self._workers_lock:
+            if self._broken:
+                return
+            previous = self._active.value
+            self._active.value = workers
+            for i in range(workers):
+                p = self._processes.get(i)
+                if p is None or not p.is_alive():
+                    p = multiprocessing.Process(
+                        target=pool_worker,
+                        args=(self._task_queue, self._result_queue, self._reduce_lock, i, self.log_queue, self._active)
+                    )
+                    p.daemon = True
+                    p.start()
+                    self._processes[i] = p
+        if previous and workers != previous and self.log_queue is not None:
+            log_message(f"Matrix pool resized from {previous} to {workers} workers", self.log_queue)
+
+    def _autoscale(self, interval):
+        while not self._stop_autoscale.wait(interval):
+            self.resize(get_available_processes(own_processes=self.active_workers))
+
+    def submit(self, matrix_a, matrix_b, engine=None):
+        """Ставит произведение A x B в очередь и возвращает Future со списком строк."""
+        if self._closed:
+            raise RuntimeError("Пул закрыт")
+        if self._broken:
+            raise BrokenProcessPool(self._broken)
+        if len(matrix_a) == 0 or len(matrix_b) == 0 or len(matrix_a[0]) != len(matrix_b):
+            raise ValueError("Количество столбцов A должно совпадать с количеством строк B")
+        engine = engine or self.engine
+        if engine not in available_engines():
+            raise ValueError(f"Неизвестный движок: {engine}")
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        shared = [SharedMatrix.from_rows(matrix_a), SharedMatrix.from_rows(matrix_b)]
+        shared.append(SharedMatrix.create(len(matrix_a), len(matrix_b[0])))
+        descriptors = tuple(matrix.descriptor() for matrix in shared)
+        tiles = plan_tiles(len(matrix_a), len(matrix_b[0]), len(matrix_b), self.workers, self.tile_size)
+        with self._jobs_lock:
+            job_id = self._next_job_id
+            self._next_job_id += 1
+            self._jobs[job_id] = {"future": future, "shared": shared, "remaining": len(tiles), "error": None}
+        for tile in tiles:
+            self._task_queue.put((job_id, descriptors, tile, engine))
+        return future
+
+    def submit_batch(self, jobs, engine=None):
+        """Ставит в очередь пачку пар (A, B); плитки всех заданий перемешиваются в очереди."""
+        return [self.submit(matrix_a, matrix_b, engine) for matrix_a, matrix_b in jobs]
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            if time.monotonic() - last_check >= POOL_WATCH_INTERVAL:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                message = self._result_queue.get(timeout=POOL_WATCH_INTERVAL)
+            except queue.Empty:
+                # Упавший процесс мог оставить очередь результатов захваченной,
+                # и сигнал остановки из close() тогда не дойдёт
+                if self._closed and self._broken:
+                    break
+                continue
+            if message is None:
+                break
+            job_id, error = message
+            with self._jobs_lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue  # Задание уже завершено с ошибкой после падения процесса
+                job["remaining"] -= 1
+                if error and job["error"] is None:
+                    job["error"] = error
+                if job["remaining"]:
+                    continue
+                del self._jobs[job_id]
+            self._finish(job)
+
+    def _check_workers(self):
+        """Помечает пул сломанным, если процесс завершился с ненулевым кодом.
+
+        Нулевой код — штатный выход после resize(). Остальные процессы
+        останавливаются, незавершённые задания получают BrokenProcessPool.
+        """
+        with self._workers_lock:
+            if self._broken:
+                return
+            crashed = [p for p in self._processes.values() if p.exitcode not in (None, 0)]
+            if not crashed:
+                return
+            self._broken = f"Процесс пула {crashed[0].pid} аварийно завершился с кодом {crashed[0].exitcode}"
+            for p in self._processes.values():
+                if p.is_alive():
+                    p.terminate()
+        if self.log_queue is not None:
+            log_message(f"Matrix pool broken: worker {crashed[0].pid} exited with code {crashed[0].exitcode}", self.log_queue)
+        with self._jobs_lock:
+            jobs, self._jobs = list(self._jobs.values()), {}
+        for job in jobs:
+            job["error"] = BrokenProcessPool(self._broken)
+            self._finish(job)
+
+    def _finish(self, job):
+        shared_a, shared_b, shared_c = job["shared"]
+        try:
+            if job["error"] is None:
+                job["future"].set_result([row.tolist() for row in shared_c])
+            elif isinstance(job["error"], Exception):
+                job["future"].set_exception(job["error"])
+            else:
+                job["future"].set_exception(RuntimeError(job["error"]))
+        finally:
+            for matrix in job["shared"]:
+                matrix.unlink()
+
+    def close(self):
+        """Дожидается начатых заданий и останавливает процессы."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_autoscale.set()
+        if self._autoscaler is not None:
+            self._autoscaler.join()
+        self._check_workers()
+        with self._workers_lock:
+            processes = [p for p in self._processes.values() if p.is_alive()]
+        if self._broken:
+            for p in processes:
+                p.terminate()
+        else:
+            for _ in processes:
+                self._task_queue.put(None)
+        for p in processes:
+            p.join()
+        if self._broken:
+            # Непрочитанные плитки и захваченные упавшим процессом очереди
+            # не должны задерживать выход интерпретатора
+            self._task_queue.cancel_join_thread()
+            self._result_queue.cancel_join_thread()
+        else:
+            self._result_queue.put(None)
+        self._collector.join()
+        with self._jobs_lock:
+            jobs, self._jobs = list(self._jobs.values()), {}
+        for job in jobs:
+            job["error"] = job["error"] or "Пул закрыт до завершения задания"
+            self._finish(job)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _quadrants(matrix, half):
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix[:half, :half], matrix[:half, half:], matrix[half:, :half], matrix[half:, half:]
+    top, bottom = matrix[:half], matrix[half:]
+    return ([row[:half] for row in top], [row[half:] for row in top],
+            [row[:half] for row in bottom], [row[half:] for row in bottom])
+
+def _madd(x, y):
+    if np is not None and isinstance(x, np.ndarray):
+        return x + y
+    return [[a + b for a, b in zip(row_x, row_y)] for row_x, row_y in zip(x, y)]
+
+def _msub(x, y):
+    if np is not None and isinstance(x, np.ndarray):
+        return x - y
+    return [[a - b for a, b in zip(row_x, row_y)] for row_x, row_y in zip(x, y)]
+
+def _join(c11, c12, c21, c22):
+    if np is not None and isinstance(c11, np.ndarray):
+        return np.block([[c11, c12], [c21, c22]])
+    return [r1 + r2 for r1, r2 in zip(c11, c12)] + [r1 + r2 for r1, r2 in zip(c21, c22)]
+
+def _pad(matrix, size):
+    """Дополняет квадратную матрицу нулями до size x size."""
+    if np is not None and isinstance(matrix, np.ndarray):
+        extra = size - matrix.shape[0]
+        return np.pad(matrix, ((0, extra), (0, extra)))
+    return [list(row) + [0] * (size - len(row)) for row in matrix] + [[0] * size for _ in range(size - len(matrix))]
+
+def _trim(matrix, size):
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix[:size, :size]
+    return [row[:size] for row in matrix[:size]]
+
+def _strassen(matrix_a, matrix_b, crossover, leaf):
+    """Рекурсия Штрассена; возвращает функцию, собирающую результат.
+
+    Листья (n <= crossover) сразу отдаются в leaf, поэтому при работе через пул
+    все 7^глубина подзадач попадают в очередь до того, как мы начнём ждать.
+    """
+    n = len(matrix_a)
+    if n <= crossover:
+        return leaf(matrix_a, matrix_b)
+    size = n + n % 2
+    if size != n:
+        matrix_a, matrix_b = _pad(matrix_a, size), _pad(matrix_b, size)
+    a11, a12, a21, a22 = _quadrants(matrix_a, size // 2)
+    b11, b12, b21, b22 = _quadrants(matrix_b, size // 2)
+    products = [
+        _strassen(_madd(a11, a22), _madd(b11, b22), crossover, leaf),
+        _strassen(_madd(a21, a22), b11, crossover, leaf),
+        _strassen(a11, _msub(b12, b22), crossover, leaf),
+        _strassen(a22, _msub(b21, b11), crossover, leaf),
+        _strassen(_madd(a11, a12), b22, crossover, leaf),
+        _strassen(_msub(a21, a11), _madd(b11, b12), crossover, leaf),
+        _strassen(_msub(a12, a22), _madd(b21, b22), crossover, leaf),
+    ]
+
+    def resolve():
+        m1, m2, m3, m4, m5, m6, m7 = (product() for product in products)
+        c11 = _madd(_msub(_madd(m1, m4), m5), m7)
+        c12 = _madd(m3, m5)
+        c21 = _madd(m2, m4)
+        c22 = _madd(_madd(_msub(m1, m2), m3), m6)
+        return _trim(_join(c11, c12, c21, c22), n)
+    return resolve
+
+def strassen_multiply(matrix_a, matrix_b, crossover=64, engine="python", pool=None):
+    """Умножение квадратных матриц алгоритмом Штрассена.
+
+    Подматрицы размером не больше crossover умножаются классическим движком
+    engine. Если передан MatrixPool, эти подзадачи считаются в его процессах
+    параллельно. Арифметика целочисленная, поэтому результат совпадает с
+    классическим умножением бит в бит (для numpy — пока суммы помещаются в int64).
+    """
+    n = len(matrix_a)
+    if any(len(row) != n for row in matrix_a) or len(matrix_b) != n or any(len(row) != n for row in matrix_b):
+        raise ValueError("Алгоритм Штрассена работает только с квадратными матрицами одного размера")
+    if crossover < 1:
+        raise ValueError("Порог перехода должен быть положительным")
+    if engine == "numpy":
+        matrix_a, matrix_b = _as_array(matrix_a), _as_array(matrix_b)
+
+    def leaf(a, b):
+        if pool is not None:
+            rows = pool.submit(a, b, engine).result
+            return (lambda: np.asarray(rows(), dtype=np.int64)) if engine == "numpy" else rows
+        product = ENGINES[engine](a, b, 0, len(a))
+        return lambda: product
+
+    result = _strassen(matrix_a, matrix_b, crossover, leaf)()
+    return result.tolist() if np is not None and isinstance(result, np.ndarray) else result
+
+def run_pickled(matrix_a, matrix_b, num_processes, engine, log_queue, checkpoint_dir=None):
+    """Прежний путь: матрицы копируются в каждый процесс, полосы собираются из очереди."""
+    blocks, assignments = _plan_resume(len(matrix_a), num_processes, log_queue, checkpoint_dir, len(matrix_b[0]))
+    result_queue = multiprocessing.Queue()
+    processes = []
+    
+    # запуск процессов
+    for i, ranges in enumerate(assignments):
+        p = multiprocessing.Process(
+            target=multiply_partial,
+            args=(matrix_a, matrix_b, ranges, i, log_queue, result_queue, engine, checkpoint_dir)
+        )
+        processes.append(p)
+        p.start()
+    
+    # сбор результатов
+    results = list(blocks)
+    for _ in processes:
+        results.extend(result_queue.get())
+    
+    # Ожидание зав
+    for p in processes:
+        p.join()
     
-    result_queue.put((start_row, end_row, result_part))
-    log_message(f"Process {process_id} finished rows {start_row}-{end_row-1}", log_queue)
+    # Объединение результатов
+    return combine_results(results, len(matrix_a), len(matrix_b[0]))
 
 def combine_results(result_parts, total_rows, total_cols):
     result = [[0] * total_cols for _ in range(total_rows)]
@@ -73,20 +1254,150 @@ def combine_results(result_parts, total_rows, total_cols):
             result[i] = part[i - start_row]
     return result
 
-def logger_process(log_queue, stop_event):
-    with open("matrix_multiplication.log", "a") as log_file:
-        while not stop_event.is_set() or not log_queue.empty():
+def logger_process(log_queue, stop_event, log_path="matrix_multiplication.log", echo=True):
+    """Пишет логи пачками: забирает из очереди всё накопившееся за раз и
+    сбрасывает файл и консоль по объёму (LOG_FLUSH_BYTES) или по времени
+    (LOG_FLUSH_INTERVAL), а не после каждой строки. В конце пишет свою
+    пропускную способность.
+    """
+    entries = 0
+    written = 0
+    busy = 0.0
+    pending = []
+    pending_bytes = 0
+    last_flush = time.monotonic()
+    with open(log_path, "a") as log_file:
+        while True:
             try:
-                log_entry = log_queue.get(timeout=1)
-                print(log_entry)  # Вывод в консоль
-                log_file.write(log_entry + "\n")
+                pending.append(log_queue.get(timeout=LOG_FLUSH_INTERVAL))
+            except queue.Empty:
+                if stop_event.is_set():
+                    break
+            else:
+                started = time.perf_counter()
+                pending_bytes += len(pending[-1])
+                while len(pending) < 1000:
+                    try:
+                        entry = log_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    pending.append(entry)
+                    pending_bytes += len(entry)
+                busy += time.perf_counter() - started
+            if pending and (pending_bytes >= LOG_FLUSH_BYTES or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL
+                            or stop_event.is_set()):
+                started = time.perf_counter()
+                chunk = "\n".join(pending) + "\n"
+                log_file.write(chunk)
                 log_file.flush()
-            except:
-                pass
+                if echo:
+                    sys.stdout.write(chunk)  # Вывод в консоль
+                    sys.stdout.flush()
+                entries += len(pending)
+                written += len(chunk)
+                pending = []
+                pending_bytes = 0
+                last_flush = time.monotonic()
+                busy += time.perf_counter() - started
+        rate = entries / busy if busy > 0 else float("inf")
+        summary = f"Logger wrote {entries} entries ({written / 1024:.1f} KiB), busy {busy:.3f} s, {rate:.0f} entries/s"
+        log_file.write(summary + "\n")
+        if echo:
+            print(summary)
+    return entries
+
+def benchmark_strassen(size=256, crossovers=(16, 32, 64, 128), engine="python", workers=None):
+    """Сравнивает классическое умножение со Штрассеном при разных порогах перехода.
+
+    Для каждого порога проверяется, что результат совпадает с классическим.
+    """
+    matrix_a = generate_matrix(size, size)
+    matrix_b = generate_matrix(size, size)
+    start = time.perf_counter()
+    expected = ENGINES[engine](matrix_a, matrix_b, 0, size)
+    classic = time.perf_counter() - start
+    expected = expected.tolist() if np is not None and isinstance(expected, np.ndarray) else expected
+    print(f"Матрицы {size}x{size}, движок {engine}")
+    print(f"{'Порог':>8} {'Штрассен, с':>12} {'Пул, с':>10} {'Классика, с':>12}")
+    with MatrixPool(workers, engine) as pool:
+        for crossover in crossovers:
+            start = time.perf_counter()
+            result = strassen_multiply(matrix_a, matrix_b, crossover, engine)
+            serial = time.perf_counter() - start
+            start = time.perf_counter()
+            pooled = strassen_multiply(matrix_a, matrix_b, crossover, engine, pool)
+            parallel = time.perf_counter() - start
+            assert result == expected and pooled == expected, "Результат Штрассена расходится с классическим"
+            print(f"{crossover:>8} {serial:>12.3f} {parallel:>10.3f} {classic:>12.3f}")
+
+def benchmark_generate(size=2000, workers=None):
+    """Сравнивает поэлементный randint с блочной генерацией в список, общую память и .npy."""
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    [[random.randint(*VALUE_RANGE) for _ in range(size)] for _ in range(size)]
+    baseline = time.perf_counter() - start
+    print(f"Матрица {size}x{size}, процессов: {workers}")
+    print(f"{'Способ':>22} {'Время, с':>10} {'Ускорение':>10}")
+    print(f"{'randint по элементу':>22} {baseline:>10.3f} {1:>10.1f}")
+    start = time.perf_counter()
+    generate_matrix(size, size, seed=1)
+    elapsed = time.perf_counter() - start
+    print(f"{'список строк':>22} {elapsed:>10.3f} {baseline / elapsed:>10.1f}")
+    start = time.perf_counter()
+    shared = generate_shared(size, size, seed=1, workers=workers)
+    elapsed = time.perf_counter() - start
+    shared.unlink()
+    print(f"{'общая память':>22} {elapsed:>10.3f} {baseline / elapsed:>10.1f}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        generate_npy(os.path.join(tmp_dir, "matrix.npy"), size, size, seed=1, workers=workers)
+        elapsed = time.perf_counter() - start
+    print(f"{'файл .npy':>22} {elapsed:>10.3f} {baseline / elapsed:>10.1f}")
+
+def _log_producer(log_queue, messages, result_queue):
+    started = time.perf_counter()
+    for i in range(messages):
+        log_message(f"Benchmark message {i}", log_queue)
+    result_queue.put((time.perf_counter() - started, dropped_logs_total))
+
+def benchmark_logging(messages=100000, producers=2):
+    """Пропускная способность логгера: producers процессов пишут по messages сообщений."""
+    log_queue = multiprocessing.Queue(LOG_QUEUE_SIZE)
+    stop_event = multiprocessing.Event()
+    result_queue = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "benchmark.log")
+        logger = multiprocessing.Process(target=logger_process, args=(log_queue, stop_event, log_path, False))
+        logger.start()
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=_log_producer, args=(log_queue, messages, result_queue))
+            for _ in range(producers)
+        ]
+        for p in processes:
+            p.start()
+        results = [result_queue.get() for _ in processes]
+        for p in processes:
+            p.join()
+        stop_event.set()
+        logger.join()
+        elapsed = time.perf_counter() - start
+        with open(log_path) as f:
+            written = sum(1 for _ in f) - 1
+    produce = max(duration for duration, _ in results)
+    print(f"Сообщений: {messages * producers}, записано: {written}, сброшено при переполнении: {sum(d for _, d in results)}")
+    print(f"Время отправки: {produce:.3f} с ({messages * producers / produce:.0f} сообщений/с)")
+    print(f"Время до записи всех сообщений: {elapsed:.3f} с ({written / elapsed:.0f} строк/с)")
+
+BENCHMARKS = {
+    "strassen": benchmark_strassen,
+    "generate": benchmark_generate,
+    "logging": benchmark_logging,
+}
 
 def main():
     # Инициализация логгирования
-    log_queue = multiprocessing.Queue()
+    log_queue = multiprocessing.Queue(LOG_QUEUE_SIZE)
     stop_logging_event = multiprocessing.Event()
     logger = multiprocessing.Process(
         target=logger_process,
@@ -97,8 +1408,31 @@ def main():
     log_message("Program started", log_queue)
     
     try:
+        # Незавершённая задача из контрольной точки
+        resumed = load_checkpoint_inputs(CHECKPOINT_DIR)
+        if resumed is not None:
+            a_rows, a_cols, b_cols = len(resumed[0]), len(resumed[1]), len(resumed[1][0])
+            answer = input(f"Найдена незавершённая задача {a_rows}x{a_cols} * {a_cols}x{b_cols}. Продолжить? (д/н) [д]: ")
+            if answer.strip().lower() == "н":
+                resumed = None
+        
+        # Матрицы из файлов .npy: процессы работают прямо с отображёнными в память файлами
+        input_paths = None
+        if resumed is None:
+            path_a = input("Файл .npy с первой матрицей (пусто — сгенерировать): ").strip()
+            if path_a:
+                path_b = input("Файл .npy со второй матрицей: ").strip()
+                mapped_a, mapped_b = MappedMatrix.open(path_a), MappedMatrix.open(path_b)
+                a_rows, a_cols, b_cols = mapped_a.rows, mapped_a.cols, mapped_b.cols
+                b_rows = mapped_b.rows
+                mapped_a.close()
+                mapped_b.close()
+                if a_cols != b_rows:
+                    raise ValueError("Количество столбцов первой матрицы должно быть равно количеству строк второй матрицы")
+                input_paths = (path_a, path_b)
+        
         # Ввод размеров матриц
-        while True:
+        while resumed is None and input_paths is None:
             try:
                 a_rows = int(input("Введите количество строк первой матрицы: "))
                 a_cols = int(input("Введите количество столбцов первой матрицы: "))
@@ -111,10 +1445,50 @@ def main():
                 break
             except ValueError:
                 print("Ошибка: Введите целые числа!")
+        b_rows = a_cols
+        
+        engines = available_engines()
+        while True:
+            engine = input(f"Выберите движок умножения ({'/'.join(engines)}) [python]: ").strip() or "python"
+            if engine in engines:
+                break
+            print(f"Ошибка: Доступные движки: {', '.join(engines)}")
+        
+        use_strassen = False
+        crossover = 64
+        if a_rows == a_cols == b_cols and input_paths is None:
+            use_strassen = input("Использовать алгоритм Штрассена? (д/н) [н]: ").strip().lower() == "д"
+        while use_strassen:
+            try:
+                crossover = int(input(f"Порог перехода к классическому умножению [{crossover}]: ").strip() or crossover)
+                if crossover >= 1:
+                    break
+                print("Ошибка: Введите положительное число!")
+            except ValueError:
+                print("Ошибка: Введите целое число!")
+        
+        # Подзадачи Штрассена всегда считаются в пуле через общую память
+        use_shared = use_strassen or input_paths is not None or input("Передавать матрицы через общую память? (д/н) [д]: ").strip().lower() != "н"
+        # Плитки раздаются через общую очередь и пишутся в общую память
+        use_tiles = use_shared and not use_strassen and input_paths is None and input("Делить работу на плитки вместо полос строк? (д/н) [д]: ").strip().lower() != "н"
+        
+        seed = None
+        while resumed is None and input_paths is None:
+            try:
+                answer = input("Зерно генератора (пусто — случайное): ").strip()
+                seed = int(answer) if answer else random.randrange(2 ** 63)
+                # SeedSequence numpy не принимает отрицательные зёрна
+                if seed >= 0:
+                    break
+                print("Ошибка: Введите неотрицательное число!")
+            except ValueError:
+                print("Ошибка: Введите целое число!")
+        
+        export = input("Сохранить результат также в final_result.txt? (д/н) [н]: ").strip().lower() == "д"
         
         # Определение доступного количества процессов
         max_processes = get_available_processes()
-        log_message(f"Available CPU cores: {os.cpu_count()}, CPU load: {get_cpu_load()}%, Max available processes: {max_processes}", log_queue)
+        log_message(f"Available CPU cores: {os.cpu_count()}, CPU load: {get_cpu_load():.1f}%, Max available processes: {max_processes}", log_queue)
         
         while True:
             try:
@@ -126,60 +1500,71 @@ def main():
                 print("Ошибка: Введите целое число!")
         
         # Генерация матриц
-        log_message("Generating matrices...", log_queue)
-        matrix_a = generate_matrix(a_rows, a_cols)
-        matrix_b = generate_matrix(b_rows, b_cols)
-        
-        log_message(f"Matrix A ({a_rows}x{a_cols}):\n{matrix_a}", log_queue)
-        log_message(f"Matrix B ({b_rows}x{b_cols}):\n{matrix_b}", log_queue)
+        if input_paths is not None:
+            log_message(f"Mapping matrices from {input_paths[0]} and {input_paths[1]}...", log_queue)
+        elif resumed is not None:
+            log_message("Resuming matrices from checkpoint...", log_queue)
+            matrix_a, matrix_b = resumed
+        else:
+            log_message(f"Generating matrices with seed {seed}...", log_queue)
+            matrix_a = generate_matrix(a_rows, a_cols, seed)
+            matrix_b = generate_matrix(b_rows, b_cols, seed + 1)
         
-        # Распределение строк между процессами
-        rows_per_process = a_rows // num_processes
-        extra_rows = a_rows % num_processes
+        # Полосы строк сохраняют готовые блоки, чтобы после сбоя продолжить с места остановки
+        checkpoint_dir = None
+        if not use_tiles and not use_strassen and input_paths is None:
+            checkpoint_dir = CHECKPOINT_DIR
+            if resumed is None:
+                save_checkpoint_inputs(checkpoint_dir, matrix_a, matrix_b)
         
-        result_queue = multiprocessing.Queue()
-        processes = []
+        if input_paths is None:
+            log_message(f"Matrix A ({a_rows}x{a_cols}):\n{describe_matrix(matrix_a)}", log_queue)
+            log_message(f"Matrix B ({b_rows}x{b_cols}):\n{describe_matrix(matrix_b)}", log_queue)
         
-        log_message(f"Starting matrix multiplication with {num_processes} processes...", log_queue)
+        log_message(f"Starting matrix multiplication with {num_processes} processes, engine: {engine}, shared memory: {use_shared}, tiles: {use_tiles}, strassen: {use_strassen}...", log_queue)
         start_time = time.time()
         
-        # запуск процессов
-        for i in range(num_processes):
-            start_row = i * rows_per_process
-            end_row = start_row + rows_per_process
-            if i == num_processes - 1:
-                end_row += extra_rows
-            
-            p = multiprocessing.Process(
-                target=multiply_partial,
-                args=(matrix_a, matrix_b, start_row, end_row, i, log_queue, result_queue)
-            )
-            processes.append(p)
-            p.start()
-        
-        # сбор результатов
-        results = []
-        for _ in range(num_processes):
-            results.append(result_queue.get())
-        
-        # Ожидание зав
-        for p in processes:
-            p.join()
-        
-        # Объединение результатов
-        result_matrix = combine_results(results, a_rows, b_cols)
+        shared_result = None
+        result_matrix = None
+        if input_paths is not None:
+            run_mapped(input_paths[0], input_paths[1], "final_result.npy", num_processes, engine, log_queue)
+        elif use_strassen:
+            with MatrixPool(num_processes, engine, log_queue=log_queue, autoscale=True) as pool:
+                result_matrix = strassen_multiply(matrix_a, matrix_b, crossover, engine, pool)
+        elif use_tiles:
+            with MatrixPool(num_processes, engine, log_queue=log_queue, autoscale=True) as pool:
+                result_matrix = pool.submit(matrix_a, matrix_b).result()
+        elif use_shared:
+            # Процессы получают только имена сегментов общей памяти и пишут результат на место
+            shared_result = run_shared(matrix_a, matrix_b, num_processes, engine, log_queue, checkpoint_dir)
+            result_matrix = shared_result
+        else:
+            result_matrix = run_pickled(matrix_a, matrix_b, num_processes, engine, log_queue, checkpoint_dir)
         
         end_time = time.time()
         
         # вывод рез
-        log_message(f"Result matrix ({a_rows}x{b_cols}):\n{result_matrix}", log_queue)
-        log_message(f"Multiplication completed in {end_time - start_time:.4f} seconds", log_queue)
+        if result_matrix is not None:
+            log_message(f"Result matrix ({a_rows}x{b_cols}):\n{describe_matrix(result_matrix)}", log_queue)
+        elapsed = end_time - start_time
+        gflops = 2 * a_rows * a_cols * b_cols / elapsed / 1e9 if elapsed > 0 else float("inf")
+        log_message(f"Multiplication completed in {elapsed:.4f} seconds, engine: {engine}, {gflops:.3f} GFLOP/s", log_queue)
+        
+        # сохранение итогового результата; при работе с файлами процессы уже записали его в final_result.npy
+        if result_matrix is not None:
+            save_npy("final_result.npy", result_matrix)
+        log_message("Final result saved to final_result.npy", log_queue)
+        if export:
+            mapped_result = MappedMatrix.open("final_result.npy")
+            try:
+                export_text("final_result.txt", mapped_result)
+            finally:
+                mapped_result.close()
+            log_message("Final result exported to final_result.txt", log_queue)
         
-        # сохранение итогового результата
-        with open("final_result.txt", 'w') as f:
-            for row in result_matrix:
-                f.write(' '.join(map(str, row)) + '\n')
-        log_message("Final result saved to final_result.txt", log_queue)
+        if shared_result is not None:
+            shared_result.unlink()
+        clear_checkpoint(CHECKPOINT_DIR)
         
     except Exception as e:
         log_message(f"Error: {str(e)}", log_queue)
@@ -191,4 +1576,7 @@ def main():
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench":
+        BENCHMARKS[sys.argv[2]](*map(int, sys.argv[3:4]))
+        sys.exit(0)
     main()
\ No newline at end of file